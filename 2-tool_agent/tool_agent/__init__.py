@@ -1 +1 @@
-from . import agent
\ No newline at end of file
+from .agents import agent
@@ -1,8 +1,21 @@
+from functools import lru_cache
+
 from google.adk.agents import Agent
-from tools.portfolio_api import portfolio_flow_tool
-from google.adk.tools.agent_tool import AgentTool
 
-from .google_agent.agent import google_agent
+from tools.lazy_tool import LazyTool, from_module
+
+
+@lru_cache(maxsize=None)
+def _google_agent_tool():
+    # The google_search sub-agent is imported with the first request's tools.
+    from google.adk.tools.agent_tool import AgentTool
+    from .google_agent.agent import google_agent
+    return AgentTool(google_agent)
+
+
+def _portfolio_market_tool():
+    from tools.fanout import make_portfolio_market_tool
+    return make_portfolio_market_tool(_google_agent_tool())
 
 
 # This is now the main and only agent.
@@ -13,19 +26,34 @@ finance_agent = Agent(
     instruction=(
         "You are an expert financial analyst. Your goal is to provide specific, concise answers to the user's questions.\n\n"
         "**Your Workflow:**\n"
-        "1.  When the user first asks a financial question (e.g., 'net worth?', 'what are my funds?'), you must first call the `run_portfolio_flow` tool. This tool will load the user's complete financial data into your memory.\n"
-        "2.  The tool will return a large JSON object. **Do not just show the user the entire JSON.**\n"
-        "3.  Instead, analyze the user's original question and find the specific key in the JSON that contains the answer (e.g., for 'net worth?', look for the 'net_worth' data; for 'funds?', look for 'mutual_fund_transactions').\n"
+        "1.  When the user first asks a financial question (e.g., 'net worth?', 'what are my funds?'), you must first call the `run_portfolio_flow` tool. This tool loads the user's complete financial data into your memory and returns a compact digest: net worth, asset allocation, top holdings, credit score, EPF balance, month-to-date spend and recent large transactions.\n"
+        "2.  Answer from the digest whenever it contains the answer.\n"
+        "3.  Only if the digest is not enough, call `get_portfolio_details` with the one section you need (e.g., 'mutual_fund_transactions' for fund details) and find the specific answer in it.\n"
         "4.  Present ONLY the information the user asked for in a clear, human-readable format.\n"
         "5.  For any follow-up questions, use the data you already have in memory from the tool's first run. **Do not call the `run_portfolio_flow` tool again** if you already have the data.\n"
         "6.  When presenting any financial data (including bank transactions, net worth, credit report, stock transactions, etc.), always format your response in clear, human-readable language. Never respond with raw JSON or code blocks.\n"
         "7.  For lists of transactions or details, summarize and present the information in a way that is easy for a non-technical user to understand.\n"
         "8.  If the user asks for information that requires a Google search, use the `google_agent` tool to fetch the latest information.\n"
         "9. you also have access to the `google_agent` tool, which can search Google for the latest information. Use this tool when the user asks questions that require up-to-date information or general knowledge that is not part of the financial data.\n"
+        "10. For questions about credit cards, loans, overdue amounts, credit utilization or payment delays, call `query_credit_accounts` with the relevant filters instead of reading the credit report from the JSON. Pass '' / False / 0 for filters you do not need.\n"
+        "11. For questions about individual bank, mutual fund or stock transactions (e.g., 'last 20 bank transactions over 10000', 'fund purchases in March'), call `query_transactions` with filters, sort and limit instead of fetching the full transaction lists. Pass '' / 0 for filters you do not need, and pass the returned `next_cursor` to get the next page.\n"
+        "12. When a question needs both the user's portfolio and the latest market news (e.g., 'how did today's market move affect my portfolio?'), call `portfolio_and_market_lookup` once instead of calling `run_portfolio_flow` and `google_agent` one after another. It runs both at the same time.\n"
     ),
+    # Tools and the google_search sub-agent are imported and built on the first
+    # request, not when adk web loads this agent (see tools/lazy_tool.py).
     tools=[
-        portfolio_flow_tool,
-        AgentTool(google_agent),
+        LazyTool("run_portfolio_flow", "Fetches the user's portfolio and returns a digest.",
+                 from_module("tools.portfolio_api", "portfolio_flow_tool")),
+        LazyTool("get_portfolio_details", "Returns one raw section of the loaded portfolio.",
+                 from_module("tools.portfolio_api", "portfolio_details_tool")),
+        LazyTool("query_credit_accounts", "Filters the user's credit accounts.",
+                 from_module("tools.credit_index", "credit_query_tool")),
+        LazyTool("query_transactions", "Filters and pages the user's transactions.",
+                 from_module("tools.transaction_query", "transaction_query_tool")),
+        # AgentTool takes the sub-agent's name.
+        LazyTool("tool_agent", "Searches Google for the latest information.", _google_agent_tool),
+        LazyTool("portfolio_and_market_lookup", "Fetches the portfolio and market news at the same time.",
+                 _portfolio_market_tool),
     ],
 )
 
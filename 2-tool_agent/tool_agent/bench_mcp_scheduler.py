@@ -0,0 +1,220 @@
+"""
+Exercises tools/mcp_scheduler.py through the real fetch path: mcp_script.
+fetch_portfolio and its ClientSession talk streamable HTTP to a local FastMCP
+stub (the mcp server package comes with google-adk) that answers every tool
+after an injected delay. Checks the guarantees the agent relies on:
+  - the MCP server never sees more than MCP_MAX_CONCURRENCY calls at once,
+  - a light user is not stuck behind a heavy user's burst (fair share),
+  - interactive calls are served ahead of background refreshes,
+  - a fetch on another thread's event loop (how run_portfolio_flow fetches)
+    is scheduled too.
+
+The stub holds every call at a gate until all users have queued, so the
+checks compare the order in which the server saw calls start and the counts,
+not wall-clock latencies.
+
+Run from the tool_agent folder:  python bench_mcp_scheduler.py
+Exits non-zero if a check fails.
+"""
+
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+import uvicorn
+from mcp.server.fastmcp import Context, FastMCP
+
+CAP = 4
+DELAY_S = 0.02
+HEAVY_FETCHES = 6
+SETUP_TIMEOUT_S = 10
+TOOLS = ["fetch_net_worth", "fetch_credit_report", "fetch_epf_details",
+         "fetch_mf_transactions", "fetch_stock_transactions", "fetch_bank_transactions"]
+CALLS_PER_FETCH = len(TOOLS)
+
+
+class StubServer:
+    """
+    FastMCP server on a free localhost port. Each MCP session is labelled with
+    the user that was starting fetches when it was initialised, and every tool
+    call records its label, so the order the server saw is known per user.
+    """
+
+    def __init__(self):
+        self.mcp = FastMCP("bench", streamable_http_path="/mcp/stream", log_level="WARNING")
+        self.gate = threading.Event()
+        self.next_label = ""
+        self.labels: dict[str, str] = {}
+        self.starts: list[str] = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+        for name in TOOLS:
+            self.mcp.tool(name=name)(self._make_tool(name))
+        self._server = None
+
+    def _make_tool(self, name: str):
+        async def tool(ctx: Context) -> str:
+            label = self.labels.get(ctx.request_context.request.headers.get("mcp-session-id"), "?")
+            with self._lock:
+                self.starts.append(label)
+                self.active += 1
+                self.peak = max(self.peak, self.active)
+            try:
+                while not self.gate.is_set():
+                    await asyncio.sleep(0.002)
+                await asyncio.sleep(DELAY_S)
+                return json.dumps({"tool": name, "user": label})
+            finally:
+                with self._lock:
+                    self.active -= 1
+        return tool
+
+    def _app(self):
+        app = self.mcp.streamable_http_app()
+
+        async def labelled(scope, receive, send):
+            # A new session id comes back on the initialize response.
+            async def capture(message):
+                if message["type"] == "http.response.start":
+                    for key, value in message.get("headers", []):
+                        if key.lower() == b"mcp-session-id":
+                            self.labels.setdefault(value.decode(), self.next_label)
+                await send(message)
+            await app(scope, receive, capture if scope["type"] == "http" else send)
+
+        return labelled
+
+    def start(self) -> str:
+        """Serves on a background thread and returns the stream URL."""
+        config = uvicorn.Config(self._app(), host="127.0.0.1", port=0, log_level="warning", lifespan="on")
+        self._server = uvicorn.Server(config)
+        threading.Thread(target=self._server.run, daemon=True).start()
+        deadline = time.monotonic() + SETUP_TIMEOUT_S
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("stub MCP server did not start")
+            time.sleep(0.01)
+        port = self._server.servers[0].sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}/mcp/stream"
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+
+    def sessions(self, label: str) -> int:
+        return sum(1 for value in self.labels.values() if value == label)
+
+
+async def _wait_until(condition, what: str) -> None:
+    deadline = time.monotonic() + SETUP_TIMEOUT_S
+    while not condition():
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"timed out waiting for {what}")
+        await asyncio.sleep(0.005)
+
+
+async def scenario(stub: StubServer, mcp_script, scheduler) -> dict:
+    from tools.mcp_scheduler import BACKGROUND
+
+    def queued(priority: str) -> int:
+        return scheduler.metrics()[priority]["queued"]
+
+    results: dict = {}
+
+    # The heavy user's fetches take every slot and queue the rest of their calls.
+    stub.next_label = "heavy"
+    heavy = asyncio.gather(*(mcp_script.fetch_portfolio("heavy") for _ in range(HEAVY_FETCHES)))
+    await _wait_until(lambda: stub.active == CAP and queued("interactive") == HEAVY_FETCHES - CAP,
+                      "the heavy user to fill the cap")
+
+    stub.next_label = "light"
+    light = asyncio.ensure_future(mcp_script.fetch_portfolio("light"))
+    await _wait_until(lambda: queued("interactive") == HEAVY_FETCHES - CAP + 1, "the light user to queue")
+
+    # Same pattern as portfolio_api._fetch_portfolio: asyncio.run on a worker thread.
+    stub.next_label = "threaded"
+    thread = threading.Thread(
+        target=lambda: results.update(threaded=asyncio.run(mcp_script.fetch_portfolio("threaded")))
+    )
+    thread.start()
+    await _wait_until(lambda: queued("interactive") == HEAVY_FETCHES - CAP + 2, "the threaded user to queue")
+
+    stub.next_label = "refresh"
+    refresh = asyncio.ensure_future(mcp_script.fetch_portfolio("refresh", BACKGROUND))
+    await _wait_until(lambda: queued("background") == 1, "the background refresh to queue")
+
+    stub.gate.set()
+    results["heavy"] = await heavy
+    results["light"] = await light
+    results["refresh"] = await refresh
+    await asyncio.to_thread(thread.join)
+    return results
+
+
+def main() -> int:
+    logging.getLogger("mcp").setLevel(logging.WARNING)
+    stub = StubServer()
+    url = stub.start()
+    # Read by mcp_script and tools.mcp_scheduler at import.
+    os.environ["MCP_STREAM_URL"] = url
+    os.environ["MCP_MAX_CONCURRENCY"] = str(CAP)
+    import mcp_script
+    from tools.mcp_scheduler import scheduler
+
+    failures = []
+    try:
+        # fetch_portfolio narrates every step; keep the report readable.
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = asyncio.run(scenario(stub, mcp_script, scheduler))
+    finally:
+        stub.stop()
+
+    starts = stub.starts
+    print(f"{len(starts)} calls against {url}, cap {CAP}, peak upstream concurrency {stub.peak}")
+    print(f"  order seen by the server: {' '.join(label[0] for label in starts)}")
+    print(f"  metrics: {scheduler.metrics()}")
+
+    fetches = [("heavy", r) for r in results["heavy"]] + [(k, results[k]) for k in ("light", "threaded", "refresh")]
+    for user, result in fetches:
+        if "error" in result or any(result.get(key) is None for key in result):
+            failures.append(f"{user} fetch failed: {result}")
+    expected = {"heavy": HEAVY_FETCHES * CALLS_PER_FETCH, "light": CALLS_PER_FETCH,
+                "threaded": CALLS_PER_FETCH, "refresh": CALLS_PER_FETCH}
+    for user, count in expected.items():
+        if starts.count(user) != count:
+            failures.append(f"server saw {starts.count(user)} calls from {user}, expected {count}")
+
+    if stub.peak > CAP:
+        failures.append(f"server saw {stub.peak} concurrent calls, cap is {CAP}")
+    if stub.peak < CAP:
+        failures.append(f"server never saw {CAP} concurrent calls, so the cap was not exercised")
+
+    for user in ("light", "threaded"):
+        if user not in starts:
+            continue
+        last = len(starts) - 1 - starts[::-1].index(user)
+        heavy_before = starts[:last].count("heavy")
+        print(f"  {user}: last call started after {heavy_before} of {expected['heavy']} heavy calls")
+        if heavy_before >= expected["heavy"] / 2:
+            failures.append(f"{user} waited behind half or more of the heavy user's burst")
+        if "refresh" in starts and starts.index("refresh") < last:
+            failures.append(f"a background call started before {user}'s last interactive call")
+
+    metrics = scheduler.metrics()
+    if scheduler.in_flight != 0 or any(metrics[p]["queued"] for p in ("interactive", "background")):
+        failures.append("scheduler did not drain")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    print("OK" if not failures else f"{len(failures)} check(s) failed")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+"""
+Compares the typed portfolio model (tools/portfolio_models.py) with walking the
+raw MCP dicts, for memory footprint and access speed.
+
+Run from the tool_agent folder:  python bench_portfolio_models.py [num_txns]
+"""
+
+import gc
+import json
+import random
+import sys
+import timeit
+import tracemalloc
+
+from tools.portfolio_models import Portfolio, money
+
+
+def _money(value: float) -> dict:
+    units = int(value)
+    return {"currencyCode": "INR", "units": str(units), "nanos": int((value - units) * 1_000_000_000)}
+
+
+def sample_payload(num_txns: int = 20_000, seed: int = 7) -> dict:
+    """Builds a synthetic payload shaped like mcp_script.py's output."""
+    rng = random.Random(seed)
+    dates = [f"2024-{m:02d}-{d:02d}" for m in range(1, 13) for d in range(1, 29)]
+    lenders = ["HDFC Bank", "ICICI Bank", "SBI Card", "Axis Bank", "Bajaj Finance"]
+    accounts = [
+        {
+            "subscriberName": rng.choice(lenders),
+            "accountType": rng.choice(["10", "05", "02", "01"]),
+            "portfolioType": rng.choice(["R", "I"]),
+            "accountStatus": rng.choice(["11", "11", "11", "13", "71"]),
+            "openDate": "20200115",
+            "currentBalance": str(rng.randint(0, 300_000)),
+            "amountPastDue": str(rng.choice([0, 0, 0, rng.randint(100, 20_000)])),
+            "creditLimitAmount": str(rng.choice([100_000, 200_000, 500_000])),
+            "highestCreditOrOriginalLoanAmount": str(rng.randint(50_000, 900_000)),
+            "paymentHistoryProfile": "".join(rng.choice(["000", "000", "030", "060"]) for _ in range(12)),
+        }
+        for _ in range(40)
+    ]
+    per_bank = num_txns // 2
+    per_other = num_txns // 4
+    return {
+        "net_worth": {
+            "netWorthResponse": {
+                "assetValues": [
+                    {"netWorthAttribute": "ASSET_TYPE_MUTUAL_FUND", "value": _money(845_000.5)},
+                    {"netWorthAttribute": "ASSET_TYPE_SAVINGS_ACCOUNTS", "value": _money(210_000)},
+                    {"netWorthAttribute": "ASSET_TYPE_EPF", "value": _money(330_000)},
+                    {"netWorthAttribute": "ASSET_TYPE_INDIAN_SECURITIES", "value": _money(150_000)},
+                ],
+                "liabilityValues": [
+                    {"netWorthAttribute": "LIABILITY_TYPE_VEHICLE_LOAN", "value": _money(120_000)},
+                ],
+                "totalNetWorthValue": _money(1_415_000.5),
+            }
+        },
+        "credit_report": {
+            "creditReports": [{
+                "creditReportData": {
+                    "score": {"bureauScore": "746"},
+                    "currentApplication": {"currentApplicationDetails": {
+                        "currentApplicantDetails": {"dateOfBirthApplicant": "19900101"}}},
+                    "creditAccount": {"creditAccountDetails": accounts},
+                }
+            }]
+        },
+        "epf_details": {
+            "uanAccounts": [{
+                "rawDetails": {
+                    "est_details": [{
+                        "est_name": "ACME PVT LTD", "member_id": "MH/1234", "doj_epf": "2019-06-01",
+                        "pf_balance": {"net_balance": "330000",
+                                       "employee_share": {"balance": "180000"},
+                                       "employer_share": {"balance": "150000"}},
+                    }],
+                    "overall_pf_balance": {
+                        "current_pf_balance": "330000", "pension_balance": "90000",
+                        "employee_share_total": {"balance": "180000"},
+                        "employer_share_total": {"balance": "150000"},
+                    },
+                }
+            }]
+        },
+        "bank_transactions": {"bankTransactions": [{
+            "bank": "HDFC Bank",
+            "txns": [
+                [str(rng.randint(10, 60_000)), f"UPI/{i}", rng.choice(dates), rng.choice([1, 2, 2, 2]), "UPI",
+                 str(rng.randint(1_000, 400_000))]
+                for i in range(per_bank)
+            ],
+        }]},
+        "mutual_fund_transactions": {"mfTransactions": [{
+            "isin": "INF000000001", "schemeName": "Index Fund Direct Growth",
+            "txns": [
+                [rng.choice([1, 2]), rng.choice(dates), 120.5, 10.0, str(rng.randint(500, 50_000))]
+                for _ in range(per_other)
+            ],
+        }]},
+        "stock_transactions": {"stockTransactions": [{
+            "isin": "INE000000001",
+            "txns": [[rng.choice([1, 2]), rng.choice(dates), rng.randint(1, 50), 2450.0] for _ in range(per_other)],
+        }]},
+    }
+
+
+def _measure(build) -> tuple[object, int]:
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, size
+
+
+def dict_walk(data: dict) -> float:
+    """What the current consumers do: walk the nested dicts on every access."""
+    total = 0.0
+    report = data["credit_report"]["creditReports"][0]["creditReportData"]
+    for account in report["creditAccount"]["creditAccountDetails"]:
+        total += float(account.get("amountPastDue", 0) or 0)
+    for account in data["bank_transactions"]["bankTransactions"]:
+        for txn in account["txns"]:
+            if txn[3] == 2:
+                total += float(txn[0])
+    for scheme in data["mutual_fund_transactions"]["mfTransactions"]:
+        for txn in scheme["txns"]:
+            total += float(txn[4])
+    total += money(data["net_worth"]["netWorthResponse"]["totalNetWorthValue"])
+    return total
+
+
+def model_walk(portfolio: Portfolio) -> float:
+    total = 0.0
+    for account in portfolio.credit_report.accounts:
+        total += account.amount_past_due
+    for txn in portfolio.bank_transactions:
+        if txn.txn_type == "DEBIT":
+            total += txn.amount
+    for txn in portfolio.mf_transactions:
+        total += txn.amount
+    total += portfolio.net_worth.total
+    return total
+
+
+def main(num_txns: int) -> None:
+    text = json.dumps(sample_payload(num_txns))
+    raw, raw_bytes = _measure(lambda: json.loads(text))
+    portfolio, model_bytes = _measure(lambda: Portfolio.from_raw(raw))
+    assert abs(dict_walk(raw) - model_walk(portfolio)) < 1e-3
+
+    runs = 20
+    decode_s = timeit.timeit(lambda: Portfolio.from_raw(raw), number=3) / 3
+    dict_s = timeit.timeit(lambda: dict_walk(raw), number=runs) / runs
+    model_s = timeit.timeit(lambda: model_walk(portfolio), number=runs) / runs
+
+    print(f"transactions:       {len(portfolio.transactions):>10,}")
+    print(f"raw dict memory:    {raw_bytes / 1e6:>10.2f} MB")
+    print(f"typed model memory: {model_bytes / 1e6:>10.2f} MB")
+    print(f"one-time decode:    {decode_s * 1e3:>10.2f} ms")
+    print(f"dict walk / query:  {dict_s * 1e3:>10.2f} ms")
+    print(f"model walk / query: {model_s * 1e3:>10.2f} ms  ({dict_s / model_s:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20_000)
@@ -0,0 +1,66 @@
+"""
+Cold-worker benchmark: time from "session state has a blob handle" to the first
+answered transaction query, via the compressed JSON blob vs. the memory-mapped
+snapshot (tools/portfolio_snapshot.py). Each path runs in a fresh interpreter.
+
+Run from the tool_agent folder:  python bench_snapshot.py [num_txns]
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+COLD_QUERY = dict(min_amount=10_000, sort="date_desc", limit=20)
+
+
+def cold_start(mode: str, handle: str) -> None:
+    """Runs in the child process; prints the elapsed milliseconds."""
+    start = time.perf_counter()
+    if mode == "blob":
+        from tools.transaction_query import load_transaction_stores
+        stores = load_transaction_stores(handle)
+    else:
+        from tools.portfolio_snapshot import load_snapshot_stores
+        stores = load_snapshot_stores(handle)
+    rows, _ = stores["bank"].page(**COLD_QUERY)
+    elapsed = time.perf_counter() - start
+    print(json.dumps({"ms": elapsed * 1e3, "rows": len(rows)}))
+
+
+def main(num_txns: int) -> None:
+    from bench_portfolio_models import sample_payload
+    from tools import blob_store
+    from tools.portfolio_digest import build_digest
+    from tools.portfolio_models import Portfolio
+    from tools.portfolio_snapshot import save_snapshot, snapshot_path
+
+    payload = json.dumps(sample_payload(num_txns))
+    handle = blob_store.put(payload)
+    portfolio = Portfolio.from_raw(json.loads(payload))
+    save_snapshot(handle, portfolio, json.dumps(build_digest(portfolio)))
+
+    print(f"transactions:   {len(portfolio.transactions):>10,}")
+    print(f"json payload:   {len(payload) / 1e6:>10.2f} MB")
+    print(f"snapshot file:  {snapshot_path(handle).stat().st_size / 1e6:>10.2f} MB")
+    for mode in ("blob", "snapshot"):
+        runs = []
+        for _ in range(3):
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", mode, handle],
+                capture_output=True, text=True, check=True, env=os.environ,
+            )
+            runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+        best = min(r["ms"] for r in runs)
+        print(f"cold {mode:<9} {best:>10.1f} ms to first page ({runs[0]['rows']} rows)")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        cold_start(sys.argv[2], sys.argv[3])
+    else:
+        # Keep benchmark blobs and snapshots out of the real store.
+        os.environ.setdefault("PORTFOLIO_BLOB_DIR", tempfile.mkdtemp(prefix="portfolio-bench-"))
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
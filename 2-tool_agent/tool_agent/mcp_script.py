@@ -1,73 +1,104 @@
 import asyncio
 import json
+import os
+import time
 import webbrowser
 from mcp.client.session import ClientSession
 from mcp.client.streamable_http import streamablehttp_client
 from mcp.types import CallToolResult, TextContent
 
-async def main():
-    """Handles the entire login and data fetch process in one go."""
+from tools.mcp_scheduler import INTERACTIVE, scheduler
+
+MCP_STREAM_URL = os.environ.get("MCP_STREAM_URL", "http://localhost:8080/mcp/stream")
+
+# How long to wait for the user to finish logging in, and how often to check.
+LOGIN_TIMEOUT_S = 300
+LOGIN_POLL_S = 3
+
+async def wait_for_login(session: ClientSession, user_id: str, priority: int) -> dict | None:
+    """
+    Polls fetch_net_worth until the browser login completes and returns its
+    data, or None after LOGIN_TIMEOUT_S. Unlike a blocking input(), the wait
+    can be cancelled, so a fetch that times out closes its MCP session.
+    """
+    deadline = time.monotonic() + LOGIN_TIMEOUT_S
+    while time.monotonic() < deadline:
+        await asyncio.sleep(LOGIN_POLL_S)
+        response: CallToolResult = await scheduler.call(session, 'fetch_net_worth', {}, user_id, priority)
+        if response.content and isinstance(response.content[0], TextContent):
+            parsed_content = json.loads(response.content[0].text)
+            if parsed_content.get("status") != "login_required":
+                return parsed_content
+    return None
+
+async def fetch_portfolio(user_id: str = "local", priority: int = INTERACTIVE) -> dict:
+    """
+    Handles the entire login and data fetch process in one go and returns the
+    combined data, or a dict with an "error" key. Every MCP call is queued through
+    the shared scheduler under this user's id and priority.
+    """
     print("--- SCRIPT: Starting MCP connection... ---")
     try:
-        async with streamablehttp_client("http://localhost:8080/mcp/stream") as (read, write, _):
+        async with streamablehttp_client(MCP_STREAM_URL) as (read, write, _):
             async with ClientSession(read, write) as session:
                 await session.initialize()
                 print("--- SCRIPT: Session initialized. Triggering login... ---")
                 
                 # Trigger the login flow
-                response: CallToolResult = await session.call_tool('fetch_net_worth', {})
+                response: CallToolResult = await scheduler.call(session, 'fetch_net_worth', {}, user_id, priority)
                 if not (response.content and isinstance(response.content[0], TextContent)):
-                    print(json.dumps({"error": "Failed to get response from server."}))
-                    return
+                    return {"error": "Failed to get response from server."}
 
                 parsed_content = json.loads(response.content[0].text)
                 if parsed_content.get("status") != "login_required":
-                    # If we don't need to log in, just print the data
-                    print(json.dumps(parsed_content, indent=2))
-                    return
+                    # Already logged in: this response is the net worth data.
+                    net_worth = parsed_content
+                else:
+                    login_url = parsed_content.get("login_url")
+                    if not login_url:
+                        return {"error": "Login required but no login URL provided."}
+
+                    # --- The User Interaction Step ---
+                    print(f"--- SCRIPT: Opening browser at {login_url} ---")
+                    webbrowser.open_new_tab(login_url)
+
+                    # This is the crucial pause. The script waits here until the login is done.
+                    print("\n***** BROWSER OPENED *****\nPlease complete the login in your browser. Waiting for it to finish...")
+                    net_worth = await wait_for_login(session, user_id, priority)
+                    if net_worth is None:
+                        return {"error": f"Login was not completed within {LOGIN_TIMEOUT_S} seconds."}
+                    print("--- SCRIPT: Login complete. ---")
 
-                login_url = parsed_content.get("login_url")
-                if not login_url:
-                    print(json.dumps({"error": "Login required but no login URL provided."}))
-                    return
-                
-                # --- The User Interaction Step ---
-                print(f"--- SCRIPT: Opening browser at {login_url} ---")
-                webbrowser.open_new_tab(login_url)
-                
-                # This is the crucial pause. The script will wait here.
-                input("\n***** BROWSER OPENED *****\nPlease complete the login, then return to this terminal and press Enter to continue...")
-                
                 # --- The Data Fetching Step ---
-                print("--- SCRIPT: Login complete. Fetching all data... ---")
-                
+                print("--- SCRIPT: Fetching all data... ---")
+
                 async def call_tool(name):
-                    tool_response = await session.call_tool(name, {})
+                    tool_response = await scheduler.call(session, name, {}, user_id, priority)
                     return json.loads(tool_response.content[0].text) if tool_response.content else None
 
                 fetch_tasks = [
-                    call_tool('fetch_net_worth'),
                     call_tool('fetch_credit_report'),
                     call_tool('fetch_epf_details'),
                     call_tool('fetch_mf_transactions'),
                     call_tool('fetch_stock_transactions'),
                     call_tool('fetch_bank_transactions'),
-             ]
+                ]
                 results = await asyncio.gather(*fetch_tasks)
-                all_data = {
-                    "net_worth": results[0],
-                    "credit_report": results[1],
-                    "epf_details": results[2],
-                    "mutual_fund_transactions": results[3],
-                    "stock_transactions": results[4],
-                    "bank_transactions": results[5],
+                return {
+                    "net_worth": net_worth,
+                    "credit_report": results[0],
+                    "epf_details": results[1],
+                    "mutual_fund_transactions": results[2],
+                    "stock_transactions": results[3],
+                    "bank_transactions": results[4],
                 }
-                
-                # Print the final result for the agent to capture
-                print(json.dumps(all_data, indent=2))
 
     except Exception as e:
-        print(json.dumps({"error": f"An unhandled exception occurred: {e}"}))
+        return {"error": f"An unhandled exception occurred: {e}"}
+
+async def main():
+    """Runs the fetch and prints the result as JSON."""
+    print(json.dumps(await fetch_portfolio(), indent=2))
 
 if __name__ == "__main__":
     asyncio.run(main())
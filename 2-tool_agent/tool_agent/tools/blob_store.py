@@ -0,0 +1,120 @@
+# tools/blob_store.py
+
+"""
+Content-addressed local store for large tool payloads.
+
+The full portfolio JSON is compressed and written once under its SHA-256, and
+only a short handle ("blob:sha256:<hex>") goes into the ADK session state. With
+the database session service this keeps every state write and every per-turn
+session load small, and identical payloads are stored only once.
+
+Blobs are personal financial data, so they are not kept forever: reading or
+writing a blob marks it used, and every new blob prunes those unused for
+RETENTION_S, together with the files derived from them (snapshots are named by
+the same hash). A session whose blob was pruned simply fetches again.
+"""
+
+import hashlib
+import os
+import tempfile
+import time
+import zlib
+from pathlib import Path
+
+HANDLE_PREFIX = "blob:sha256:"
+BLOB_DIR = Path(os.environ.get("PORTFOLIO_BLOB_DIR", Path(__file__).resolve().parent.parent / ".blobs"))
+RETENTION_S = float(os.environ.get("PORTFOLIO_BLOB_RETENTION_HOURS", 24)) * 3600
+
+
+def is_handle(value) -> bool:
+    return isinstance(value, str) and value.startswith(HANDLE_PREFIX)
+
+
+def _path(digest: str) -> Path:
+    # Fan out by the first two hex characters to keep directories small.
+    return BLOB_DIR / digest[:2] / f"{digest}.z"
+
+
+def put(text: str) -> str:
+    """Stores text (if not already stored) and returns its handle."""
+    data = text.encode("utf-8")
+    digest = hashlib.sha256(data).hexdigest()
+    path = _path(digest)
+    if path.exists():
+        touch(path)
+    else:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write to a temp file and rename, so readers never see a partial blob.
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(zlib.compress(data, 6))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        prune()
+    return HANDLE_PREFIX + digest
+
+
+def get(handle: str) -> str:
+    """
+    Returns the text for a handle. Not cached here: the decoded portfolio is
+    cached per handle in portfolio_cache.
+    """
+    if not is_handle(handle):
+        raise ValueError(f"Not a blob handle: {handle[:40]!r}")
+    digest = handle[len(HANDLE_PREFIX):]
+    try:
+        data = zlib.decompress(_path(digest).read_bytes())
+    except FileNotFoundError:
+        raise ValueError(f"Blob {digest[:12]} is missing from {BLOB_DIR}.") from None
+    if hashlib.sha256(data).hexdigest() != digest:
+        raise ValueError(f"Blob {digest[:12]} is corrupt.")
+    touch(_path(digest))
+    return data.decode("utf-8")
+
+
+def touch(path: Path) -> bool:
+    """
+    Marks a stored file as used now, for the retention policy. Returns False
+    if it no longer exists (e.g. pruned by another process).
+    """
+    try:
+        os.utime(path)
+    except OSError:
+        return False
+    return True
+
+
+def touch_handle(handle: str) -> bool:
+    """touch() for the blob behind a handle: False if it is not a handle or is gone."""
+    return is_handle(handle) and touch(_path(handle[len(HANDLE_PREFIX):]))
+
+
+def prune(max_age_s: float = RETENTION_S) -> int:
+    """
+    Deletes every blob not used for max_age_s together with the files named
+    after its hash, and leftover temp files. A blob and its snapshot go as one
+    unit, judged by whichever was used last. Returns the number of files removed.
+    """
+    cutoff = time.time() - max_age_s
+    groups: dict[str, list[tuple[Path, float]]] = {}
+    for path in BLOB_DIR.rglob("*"):
+        try:
+            if path.is_file():
+                groups.setdefault(path.name.split(".")[0], []).append((path, path.stat().st_mtime))
+        except OSError:
+            continue
+    removed = 0
+    for files in groups.values():
+        if max(mtime for _, mtime in files) >= cutoff:
+            continue
+        for path, _ in files:
+            try:
+                path.unlink()
+                removed += 1
+            except OSError:
+                pass  # Removed concurrently, or still mapped on Windows.
+    return removed
+
@@ -0,0 +1,227 @@
+# tools/credit_index.py
+
+"""
+In-memory index over the credit report's accounts, so the agent can ask
+targeted questions ("which cards are overdue?") without the full
+creditAccountDetails list ever being sent to the model.
+"""
+
+from google.adk.tools import FunctionTool, ToolContext
+
+from tools import portfolio_cache
+from tools.portfolio_models import CreditAccount
+
+# Experian account type codes seen in the MCP credit report.
+ACCOUNT_TYPE_NAMES = {
+    "01": "auto loan",
+    "02": "housing loan",
+    "03": "property loan",
+    "05": "personal loan",
+    "06": "consumer loan",
+    "07": "gold loan",
+    "08": "education loan",
+    "10": "credit card",
+    "13": "two-wheeler loan",
+    "17": "commercial vehicle loan",
+    "51": "business loan",
+}
+
+# (label, lowest DPD, highest DPD) - days past due on the worst month.
+DPD_BUCKETS = [
+    ("current", 0, 0),
+    ("1-30", 1, 30),
+    ("31-60", 31, 60),
+    ("61-90", 61, 90),
+    ("90+", 91, None),
+]
+
+MAX_ROWS = 25
+
+
+def _dpd_bucket(max_dpd: int) -> str:
+    for label, low, high in DPD_BUCKETS:
+        if max_dpd >= low and (high is None or max_dpd <= high):
+            return label
+    return "current"
+
+
+def _type_key(account_type: str) -> str:
+    """Maps '10', 'credit card' or 'Credit Cards' to the same index key."""
+    text = account_type.strip().lower().rstrip("s")
+    if text in ACCOUNT_TYPE_NAMES:
+        return ACCOUNT_TYPE_NAMES[text]
+    if text.zfill(2) in ACCOUNT_TYPE_NAMES:
+        return ACCOUNT_TYPE_NAMES[text.zfill(2)]
+    return text
+
+
+class CreditIndex:
+    """
+    Precomputed lookups and aggregates over a list of CreditAccount objects.
+    Built once per fetch; every query after that is dictionary lookups plus
+    a filter over the (usually tiny) smallest candidate set.
+    """
+
+    def __init__(self, accounts: list[CreditAccount]):
+        self.accounts = accounts
+        self.by_lender: dict[str, list[int]] = {}
+        self.by_type: dict[str, list[int]] = {}
+        self.by_status: dict[str, list[int]] = {"open": [], "closed": []}
+        self.by_dpd_bucket: dict[str, list[int]] = {label: [] for label, _, _ in DPD_BUCKETS}
+
+        for i, account in enumerate(accounts):
+            self.by_lender.setdefault(account.lender.lower(), []).append(i)
+            self.by_type.setdefault(_type_key(account.account_type), []).append(i)
+            self.by_status["open" if account.is_open else "closed"].append(i)
+            self.by_dpd_bucket[_dpd_bucket(account.max_dpd)].append(i)
+
+        # Sorted views, largest first, so top-N answers are a slice.
+        self.overdue = sorted(
+            (i for i, a in enumerate(accounts) if a.amount_past_due > 0),
+            key=lambda i: accounts[i].amount_past_due, reverse=True,
+        )
+        self.by_utilization = sorted(
+            (i for i, a in enumerate(accounts) if a.utilization is not None),
+            key=lambda i: accounts[i].utilization, reverse=True,
+        )
+        ranked = set(self.by_utilization)
+        self.default_order = self.by_utilization + [i for i in range(len(accounts)) if i not in ranked]
+        self.summary = self._aggregate()
+
+    def _aggregate(self) -> dict:
+        open_accounts = [self.accounts[i] for i in self.by_status["open"]]
+        revolving = [a for a in open_accounts if a.portfolio_type == "R" or _type_key(a.account_type) == "credit card"]
+        revolving_limit = sum(a.credit_limit or a.highest_credit for a in revolving)
+        revolving_balance = sum(a.current_balance for a in revolving)
+        return {
+            "total_accounts": len(self.accounts),
+            "open_accounts": len(self.by_status["open"]),
+            "closed_accounts": len(self.by_status["closed"]),
+            "total_outstanding": round(sum(a.current_balance for a in open_accounts), 2),
+            "total_overdue": round(sum(self.accounts[i].amount_past_due for i in self.overdue), 2),
+            "accounts_overdue": len(self.overdue),
+            "revolving_limit": round(revolving_limit, 2),
+            "revolving_balance": round(revolving_balance, 2),
+            "utilization_ratio": round(revolving_balance / revolving_limit, 4) if revolving_limit else None,
+            "dpd_buckets": {label: len(ids) for label, ids in self.by_dpd_bucket.items()},
+            "accounts_by_type": {key: len(ids) for key, ids in self.by_type.items()},
+        }
+
+    def query(
+        self,
+        lender: str = "",
+        account_type: str = "",
+        status: str = "",
+        overdue_only: bool = False,
+        min_utilization: float = 0.0,
+    ) -> list[CreditAccount]:
+        """
+        Returns accounts matching every given filter. Results are ordered by
+        overdue amount when overdue_only is set, otherwise by utilization.
+        """
+        candidates: list[list[int]] = []
+        if lender:
+            key = lender.strip().lower()
+            ids = self.by_lender.get(key)
+            if ids is None:
+                # Fall back to substring match over the (small) lender keys.
+                ids = [i for name, idx in self.by_lender.items() if key in name for i in idx]
+            candidates.append(ids)
+        if account_type:
+            candidates.append(self.by_type.get(_type_key(account_type), []))
+        if status:
+            candidates.append(self.by_status.get(status.strip().lower(), []))
+        if overdue_only:
+            candidates.append(self.overdue)
+        if min_utilization > 0:
+            candidates.append([
+                i for i in self.by_utilization
+                if self.accounts[i].utilization >= min_utilization
+            ])
+
+        if not candidates:
+            return [self.accounts[i] for i in self.default_order]
+
+        # Drive from the smallest candidate list, probe the rest as sets.
+        candidates.sort(key=len)
+        others = [set(ids) for ids in candidates[1:]]
+        matched = [i for i in candidates[0] if all(i in ids for ids in others)]
+
+        if overdue_only:
+            matched.sort(key=lambda i: self.accounts[i].amount_past_due, reverse=True)
+        else:
+            matched.sort(key=lambda i: self.accounts[i].utilization or 0.0, reverse=True)
+        return [self.accounts[i] for i in matched]
+
+
+def account_row(account: CreditAccount) -> dict:
+    """Compact, model-friendly view of a single account."""
+    utilization = account.utilization
+    return {
+        "lender": account.lender,
+        "type": _type_key(account.account_type),
+        "status": "open" if account.is_open else "closed",
+        "current_balance": round(account.current_balance, 2),
+        "amount_overdue": round(account.amount_past_due, 2),
+        "credit_limit": round(account.credit_limit or account.highest_credit, 2),
+        "utilization": round(utilization, 4) if utilization is not None else None,
+        "worst_dpd": account.max_dpd,
+        "opened": account.open_date,
+    }
+
+
+def load_credit_index(handle: str) -> CreditIndex:
+    """Builds the index once per fetch (see portfolio_cache)."""
+    return portfolio_cache.load(handle).get(
+        "credit_index",
+        lambda portfolio: CreditIndex(portfolio.credit_report.accounts if portfolio.credit_report else []),
+    )
+
+
+def query_credit_accounts(
+    lender: str,
+    account_type: str,
+    status: str,
+    overdue_only: bool,
+    min_utilization: float,
+    tool_context: ToolContext,
+) -> dict:
+    """
+    Answers targeted questions about the user's credit accounts using the data
+    loaded by run_portfolio_flow, without returning the full credit report.
+
+    Args:
+        lender: Lender name or part of it (e.g. 'HDFC'). Use '' for any lender.
+        account_type: 'credit card', 'personal loan', 'housing loan', ... or
+            the bureau code (e.g. '10'). Use '' for any type.
+        status: 'open' or 'closed'. Use '' for both.
+        overdue_only: True to return only accounts with an overdue amount.
+        min_utilization: Only accounts at or above this balance/limit ratio
+            (e.g. 0.3 for 30%). Use 0 for no limit.
+
+    Returns:
+        A dict with the precomputed 'summary' (total outstanding, utilization
+        ratio, DPD buckets, ...), the number of 'matched' accounts and up to
+        25 matching 'accounts'.
+    """
+    handle = portfolio_cache.state_handle(tool_context)
+    if handle is None:
+        return {"status": "error", "message": "No portfolio loaded yet. Call run_portfolio_flow first."}
+    try:
+        index = load_credit_index(handle)
+    except ValueError as e:
+        return {"status": "error", "message": f"{e} Call run_portfolio_flow again."}
+
+    if not index.accounts:
+        return {"status": "error", "message": "No credit report data is available for this user."}
+
+    matched = index.query(lender, account_type, status, overdue_only, min_utilization)
+    return {
+        "status": "success",
+        "summary": index.summary,
+        "matched": len(matched),
+        "accounts": [account_row(account) for account in matched[:MAX_ROWS]],
+    }
+
+
+credit_query_tool = FunctionTool(func=query_credit_accounts)
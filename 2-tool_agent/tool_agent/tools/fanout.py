@@ -0,0 +1,67 @@
+# tools/fanout.py
+
+"""
+Composite tool that runs the portfolio lookup and the google_agent web search
+concurrently, for questions that need both ("how did today's market move
+affect my portfolio?"). Each branch is timed so the saving over calling the two
+tools back to back is visible in the result.
+"""
+
+import asyncio
+import time
+
+from google.adk.tools import FunctionTool, ToolContext
+from google.adk.tools.agent_tool import AgentTool
+
+from tools.portfolio_api import run_portfolio_flow
+
+
+async def _timed(coro) -> tuple[object, float]:
+    start = time.perf_counter()
+    try:
+        result = await coro
+    except Exception as e:
+        # One failing branch should not discard the other branch's answer.
+        result = f"Error: {e}"
+    return result, time.perf_counter() - start
+
+
+def make_portfolio_market_tool(search_tool: AgentTool) -> FunctionTool:
+    """
+    Builds the composite tool around the agent's existing google_agent
+    AgentTool, so the sub-agent is shared rather than constructed twice.
+    """
+
+    async def portfolio_and_market_lookup(question: str, tool_context: ToolContext) -> dict:
+        """
+        Fetches the user's portfolio digest and searches Google for the latest
+        market news at the same time. Use this for questions that need both,
+        e.g. 'how did today's market move affect my portfolio?'.
+
+        Args:
+            question: The web search to run, e.g. 'Indian stock market today Nifty Sensex'.
+
+        Returns:
+            A dict with the 'portfolio' digest, the 'market_news' search answer
+            and 'timing' in seconds for each branch and for the whole call.
+        """
+        start = time.perf_counter()
+        (portfolio, portfolio_s), (news, news_s) = await asyncio.gather(
+            # run_portfolio_flow blocks (MCP fetch, blob and snapshot I/O), so give it a thread.
+            _timed(asyncio.to_thread(run_portfolio_flow, tool_context)),
+            _timed(search_tool.run_async(args={"request": question}, tool_context=tool_context)),
+        )
+        wall_s = time.perf_counter() - start
+
+        timing = {
+            "portfolio_s": round(portfolio_s, 3),
+            "market_news_s": round(news_s, 3),
+            "wall_clock_s": round(wall_s, 3),
+            "sequential_s": round(portfolio_s + news_s, 3),
+            "saved_s": round(portfolio_s + news_s - wall_s, 3),
+        }
+        print(f"--- TOOL: Parallel lookup finished in {timing['wall_clock_s']}s "
+              f"(sequential would be {timing['sequential_s']}s). ---")
+        return {"portfolio": portfolio, "market_news": news, "timing": timing}
+
+    return FunctionTool(func=portfolio_and_market_lookup)
@@ -0,0 +1,41 @@
+# tools/lazy_tool.py
+
+"""
+Stand-in that lets an agent list a tool without importing it.
+
+`adk web` builds root_agent as soon as it imports the app, so tool objects
+passed to Agent(tools=[...]) pull in their modules (and sub-agents) at
+start-up. A LazyTool only records the tool's name; the real tool is built on
+the first LLM request that needs the agent's tools, and function calls are
+then dispatched to the real tool directly.
+"""
+
+import importlib
+
+from google.adk.tools import BaseTool
+
+
+class LazyTool(BaseTool):
+    def __init__(self, name: str, description: str, load):
+        super().__init__(name=name, description=description)
+        self._load = load
+        self._tool = None
+
+    @property
+    def tool(self) -> BaseTool:
+        if self._tool is None:
+            self._tool = self._load()
+        return self._tool
+
+    async def process_llm_request(self, *, tool_context, llm_request) -> None:
+        # The real tool adds its declaration and registers itself in
+        # llm_request.tools_dict under its own name.
+        await self.tool.process_llm_request(tool_context=tool_context, llm_request=llm_request)
+
+    async def run_async(self, *, args, tool_context):
+        return await self.tool.run_async(args=args, tool_context=tool_context)
+
+
+def from_module(module: str, attr: str):
+    """Loader for a tool object defined at module level."""
+    return lambda: getattr(importlib.import_module(module), attr)
@@ -0,0 +1,151 @@
+# tools/mcp_scheduler.py
+
+"""
+Fair-share scheduler for upstream MCP calls.
+
+Every session.call_tool goes through McpScheduler.call, which enforces a global
+concurrency cap on the MCP server. When the cap is reached, callers queue per
+priority (interactive before background refresh) and, within a priority, per
+user in round-robin order, so one user's six-dataset fetch cannot push
+everybody else to the back of the line.
+
+The scheduler is shared by the whole process. Portfolio fetches each run on
+their own event loop in a worker thread (see portfolio_api._fetch_portfolio),
+so its state is guarded by a threading lock and queued callers are woken on
+their own loop with call_soon_threadsafe.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITY_NAMES = {INTERACTIVE: "interactive", BACKGROUND: "background"}
+
+MAX_CONCURRENCY = int(os.environ.get("MCP_MAX_CONCURRENCY", 8))
+# Recent queue waits kept per priority for the percentile metrics.
+WAIT_SAMPLES = 1000
+
+
+class McpScheduler:
+    def __init__(self, max_concurrency: int = MAX_CONCURRENCY):
+        self.max_concurrency = max_concurrency
+        self.in_flight = 0
+        self.completed = 0
+        self._lock = threading.Lock()
+        # priority -> user_id -> deque of (loop, future); user order is the
+        # round-robin order, so a served user moves to the back.
+        self._queues: dict[int, OrderedDict] = {INTERACTIVE: OrderedDict(), BACKGROUND: OrderedDict()}
+        self._waits: dict[int, deque] = {p: deque(maxlen=WAIT_SAMPLES) for p in self._queues}
+
+    async def call(self, session, name: str, args: dict, user_id: str, priority: int = INTERACTIVE):
+        """session.call_tool(name, args), once the scheduler grants a slot."""
+        await self.acquire(user_id, priority)
+        try:
+            return await session.call_tool(name, args)
+        finally:
+            self.release()
+
+    async def acquire(self, user_id: str, priority: int = INTERACTIVE) -> None:
+        queued_at = time.perf_counter()
+        with self._lock:
+            if self.in_flight < self.max_concurrency and not self._has_waiters():
+                self.in_flight += 1
+                self._waits[priority].append(0.0)
+                return
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            entry = (loop, future)
+            self._queues[priority].setdefault(user_id, deque()).append(entry)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                waiters = self._queues[priority].get(user_id)
+                if waiters is not None and entry in waiters:
+                    # Still queued: just leave the queue.
+                    waiters.remove(entry)
+                    if not waiters:
+                        del self._queues[priority][user_id]
+                    raise
+            if future.done() and not future.cancelled():
+                # The slot was granted as we were cancelled: pass it on.
+                self.release_unused()
+            # Otherwise the grant is in flight and _grant releases it.
+            raise
+
+        with self._lock:
+            self._waits[priority].append(time.perf_counter() - queued_at)
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+            self._dispatch()
+
+    def _has_waiters(self) -> bool:
+        return any(self._queues[p] for p in self._queues)
+
+    def _dispatch(self) -> None:
+        """Hands free slots to the next waiters. Caller holds the lock."""
+        while self.in_flight < self.max_concurrency:
+            entry = self._next_waiter()
+            if entry is None:
+                return
+            loop, future = entry
+            self.in_flight += 1
+            try:
+                loop.call_soon_threadsafe(self._grant, future)
+            except RuntimeError:
+                # The waiter's event loop is closed; reclaim the slot.
+                self.in_flight -= 1
+
+    def _next_waiter(self):
+        for priority in sorted(self._queues):
+            users = self._queues[priority]
+            if users:
+                user_id, waiters = users.popitem(last=False)
+                entry = waiters.popleft()
+                if waiters:
+                    users[user_id] = waiters
+                return entry
+        return None
+
+    def _grant(self, future: asyncio.Future) -> None:
+        # Runs on the waiter's own loop.
+        if future.cancelled():
+            self.release_unused()
+        else:
+            future.set_result(None)
+
+    def release_unused(self) -> None:
+        """Returns a granted slot that its caller gave up on before using."""
+        with self._lock:
+            self.in_flight -= 1
+            self._dispatch()
+
+    def metrics(self) -> dict:
+        with self._lock:
+            result = {
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self.in_flight,
+                "completed": self.completed,
+            }
+            for priority, name in PRIORITY_NAMES.items():
+                waits = sorted(self._waits[priority])
+                result[name] = {
+                    "queued": sum(len(w) for w in self._queues[priority].values()),
+                    "users_waiting": len(self._queues[priority]),
+                    "avg_wait_ms": round(sum(waits) / len(waits) * 1000, 2) if waits else 0.0,
+                    "p95_wait_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000, 2) if waits else 0.0,
+                    "max_wait_ms": round(waits[-1] * 1000, 2) if waits else 0.0,
+                }
+            return result
+
+
+# One scheduler per process, in front of every MCP call.
+scheduler = McpScheduler()
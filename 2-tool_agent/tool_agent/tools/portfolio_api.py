@@ -1,37 +1,129 @@
 # tools/portfolio_api.py
 
 from google.adk.tools import FunctionTool, ToolContext
-import subprocess
-import sys
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import importlib
 import json
 
+from tools import blob_store, portfolio_cache, portfolio_snapshot
+from tools.portfolio_models import extract_payload
+from tools.credit_index import load_credit_index
+from tools.portfolio_digest import load_digest
+from tools.transaction_query import load_transaction_stores
+
+# Backstop for one fetch, including the user's browser login
+# (mcp_script.LOGIN_TIMEOUT_S) and the data calls after it.
+FETCH_TIMEOUT_S = 360
+
+PORTFOLIO_SECTIONS = [
+    "net_worth", "credit_report", "epf_details",
+    "mutual_fund_transactions", "stock_transactions", "bank_transactions",
+]
+
 def run_portfolio_flow(tool_context: ToolContext) -> str:
     """
     Manages fetching portfolio data. It first checks for cached data in the agent's
     state. If no data is found, it runs the interactive script to fetch new data,
-    caches it, and then returns it.
+    caches it, and then returns a compact digest of it (net worth, allocation,
+    top holdings, credit score, EPF balance, month-to-date spend and recent
+    large transactions). Use get_portfolio_details for the raw data.
     """
-    # 1. Check the agent's memory (state) for existing data.
-    if 'portfolio_data' in tool_context.state:
-        print("--- TOOL: Found cached data. Returning from state. ---")
-        # Return the cached data directly.
-        return tool_context.state['portfolio_data']
+    # 1. Check the agent's memory (state) for existing data. State only holds
+    #    a blob handle; the payload itself lives in the local blob store.
+    handle = portfolio_cache.state_handle(tool_context)
+    if handle is not None:
+        # A memory-mapped snapshot already holds the digest, so a cold worker
+        # can answer without reading or decoding the payload.
+        snapshot = portfolio_snapshot.open_snapshot(handle)
+        if snapshot is not None:
+            print("--- TOOL: Found cached data. Returning digest from snapshot. ---")
+            return snapshot.digest
+        try:
+            digest = load_digest(handle)
+            print("--- TOOL: Found cached data. Returning digest from state. ---")
+            return digest
+        except ValueError as e:
+            print(f"--- TOOL: Cached data unavailable ({e}). Fetching again. ---")
 
     # 2. If no data is in memory, run the script to fetch it.
     print("--- TOOL: No cached data found. Running interactive script. ---")
     try:
-        result = subprocess.run(
-            [sys.executable, 'mcp_script.py'],
-            capture_output=True, text=True, check=True, timeout=300
-        )
-        
-        # 3. Store the newly fetched data in the agent's memory for next time.
-        tool_context.state['portfolio_data'] = result.stdout
-        
-        return result.stdout
+        data = _fetch_portfolio(_user_id(tool_context))
+        if "error" in data:
+            return f"Error: The portfolio script failed. Details: {data['error']}"
+        portfolio_data = json.dumps(data)
+
+        # 3. Store the newly fetched data for next time, keeping only its
+        #    handle in the agent's memory.
+        handle = blob_store.put(portfolio_data)
+        tool_context.state['portfolio_data'] = handle
+
+        # 4. Decode the fetched dict into the typed model (no JSON round trip)
+        #    and build the credit index, transaction stores and digest once,
+        #    so the query tools reuse them.
+        portfolio = portfolio_cache.seed(handle, data).portfolio
+        load_credit_index(handle)
+        load_transaction_stores(handle)
+        digest = load_digest(handle)
+
+        # 5. Write the memory-mapped snapshot other workers warm-start from.
+        try:
+            portfolio_snapshot.save_snapshot(handle, portfolio, digest)
+        except OSError as e:
+            print(f"--- TOOL: Could not write portfolio snapshot ({e}). ---")
+
+        return digest
     except Exception as e:
         return f"Error: Failed to execute the main portfolio script. Details: {e}"
 
+def _user_id(tool_context: ToolContext) -> str:
+    """
+    The ADK user the tool runs for, used for fair queuing of MCP calls.
+    ToolContext does not expose it publicly in this ADK version.
+    """
+    invocation_context = getattr(tool_context, '_invocation_context', None)
+    return getattr(invocation_context, 'user_id', None) or 'local'
+
+def _fetch_portfolio(user_id: str) -> dict:
+    """
+    Runs mcp_script.fetch_portfolio in-process. The script module (and the mcp
+    client it pulls in) is imported on the first fetch only, instead of at agent
+    start-up or in a fresh subprocess on every fetch. The coroutine gets its own
+    event loop on a worker thread because ADK may call this tool from a running loop.
+    On timeout the coroutine is cancelled, which closes its MCP session, and the
+    thread exits before this returns.
+    """
+    mcp_script = importlib.import_module('mcp_script')
+
+    async def fetch() -> dict:
+        return await asyncio.wait_for(mcp_script.fetch_portfolio(user_id), timeout=FETCH_TIMEOUT_S)
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(asyncio.run, fetch()).result()
+
+def get_portfolio_details(section: str, tool_context: ToolContext) -> str:
+    """
+    Returns the raw data for one section of the loaded portfolio. Only call this
+    when the digest from run_portfolio_flow does not answer the question.
+
+    Args:
+        section: One of 'net_worth', 'credit_report', 'epf_details',
+            'mutual_fund_transactions', 'stock_transactions', 'bank_transactions'.
+    """
+    if section not in PORTFOLIO_SECTIONS:
+        return f"Error: Unknown section '{section}'. Choose one of: {', '.join(PORTFOLIO_SECTIONS)}."
+    handle = portfolio_cache.state_handle(tool_context)
+    if handle is None:
+        return "Error: No portfolio loaded yet. Call run_portfolio_flow first."
+    try:
+        # Rarely needed, so the raw payload is read from the store rather than cached.
+        payload = extract_payload(blob_store.get(handle))
+    except ValueError as e:
+        return f"Error: {e}"
+    return json.dumps(payload.get(section), indent=2)
+
 # This part remains the same.
 portfolio_flow_tool = FunctionTool(func=run_portfolio_flow)
+portfolio_details_tool = FunctionTool(func=get_portfolio_details)
 
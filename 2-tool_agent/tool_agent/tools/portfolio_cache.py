@@ -0,0 +1,95 @@
+# tools/portfolio_cache.py
+
+"""
+Per-process cache of decoded portfolios, keyed on the blob handle kept in
+session state.
+
+Each entry holds one fetch's typed Portfolio plus whatever the tools derive
+from it (credit index, transaction stores, digest). Entries are evicted
+together, least recently used first, so at most MAX_ENTRIES fetches stay in
+memory, and a lookup only hashes the short handle instead of the payload.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from tools import blob_store
+from tools.portfolio_models import Portfolio, extract_payload
+
+MAX_ENTRIES = 4
+
+
+@dataclass(slots=True)
+class CachedPortfolio:
+    portfolio: Portfolio
+    derived: dict = field(default_factory=dict)
+
+    def get(self, name: str, build):
+        """Returns build(portfolio), computed on the first call for this fetch."""
+        if name not in self.derived:
+            self.derived[name] = build(self.portfolio)
+        return self.derived[name]
+
+
+_entries: OrderedDict[str, CachedPortfolio] = OrderedDict()
+# Tools may run on worker threads (see fanout.py).
+_lock = threading.Lock()
+
+
+def _remember(handle: str, entry: CachedPortfolio) -> CachedPortfolio:
+    with _lock:
+        _entries[handle] = entry
+        _entries.move_to_end(handle)
+        while len(_entries) > MAX_ENTRIES:
+            _entries.popitem(last=False)
+    return entry
+
+
+def seed(handle: str, payload: dict) -> CachedPortfolio:
+    """Caches a payload that was just fetched and stored, without reading it back."""
+    return _remember(handle, CachedPortfolio(Portfolio.from_raw(payload)))
+
+
+def load(handle: str) -> CachedPortfolio:
+    """
+    Returns the entry for a blob handle, reading and decoding the blob on a
+    miss. Raises ValueError if the blob is missing, corrupt or not JSON.
+    """
+    with _lock:
+        entry = _entries.get(handle)
+        if entry is not None:
+            _entries.move_to_end(handle)
+    # A hit still counts as use of the blob for the retention policy, and an
+    # entry whose blob was pruned is dropped rather than served.
+    if entry is not None:
+        if blob_store.touch_handle(handle):
+            return entry
+        evict(handle)
+    return _remember(handle, CachedPortfolio(Portfolio.from_raw(extract_payload(blob_store.get(handle)))))
+
+
+def evict(handle: str) -> None:
+    with _lock:
+        _entries.pop(handle, None)
+
+
+def state_handle(tool_context) -> str | None:
+    """
+    The blob handle in session state, or None before the first fetch or once
+    its blob has been pruned, so run_portfolio_flow fetches again.
+    Sessions saved before the blob store kept the payload itself in state;
+    it is moved into the store once and replaced by its handle.
+    """
+    if 'portfolio_data' not in tool_context.state:
+        return None
+    value = tool_context.state['portfolio_data']
+    if not blob_store.is_handle(value):
+        value = blob_store.put(value)
+        tool_context.state['portfolio_data'] = value
+    elif not blob_store.touch_handle(value):
+        evict(value)
+        return None
+    return value
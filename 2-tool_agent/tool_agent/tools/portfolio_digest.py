@@ -0,0 +1,141 @@
+# tools/portfolio_digest.py
+
+"""
+Builds a small, bounded-size digest of the user's portfolio at fetch time.
+The agent receives this first; raw datasets are pulled only when a question
+actually needs them (see get_portfolio_details).
+"""
+
+from __future__ import annotations
+
+import json
+from collections import defaultdict
+from datetime import date, timedelta
+
+from tools import portfolio_cache
+from tools.credit_index import load_credit_index
+from tools.portfolio_models import Portfolio
+
+TOP_HOLDINGS = 5
+LARGE_TRANSACTIONS = 5
+LARGE_TRANSACTION_MIN = 10_000
+RECENT_DAYS_WINDOW = 30
+NARRATION_CHARS = 60
+
+
+def _allocation(portfolio: Portfolio) -> dict:
+    assets = portfolio.net_worth.assets if portfolio.net_worth else []
+    total = sum(asset.value for asset in assets)
+    if total <= 0:
+        return {}
+    return {
+        asset.attribute.replace("ASSET_TYPE_", "").lower(): round(asset.value / total * 100, 1)
+        for asset in sorted(assets, key=lambda a: a.value, reverse=True)
+    }
+
+
+def _top_holdings(portfolio: Portfolio) -> list[dict]:
+    holdings = portfolio.net_worth.holdings if portfolio.net_worth else []
+    if holdings:
+        ranked = sorted(holdings, key=lambda h: h.current_value, reverse=True)[:TOP_HOLDINGS]
+        return [
+            {"name": h.name, "current_value": round(h.current_value, 2), "invested": round(h.invested_value, 2)}
+            for h in ranked
+        ]
+
+    # No scheme analytics in the payload: fall back to net amount invested per
+    # instrument from the MF and stock transactions.
+    invested: dict[str, float] = defaultdict(float)
+    for txn in portfolio.mf_transactions + portfolio.stock_transactions:
+        if txn.txn_type == "BUY":
+            invested[txn.instrument] += txn.amount
+        elif txn.txn_type == "SELL":
+            invested[txn.instrument] -= txn.amount
+    ranked = sorted(invested.items(), key=lambda item: item[1], reverse=True)[:TOP_HOLDINGS]
+    return [{"name": name, "net_invested": round(value, 2)} for name, value in ranked if value > 0]
+
+
+def _bank_activity(portfolio: Portfolio) -> dict:
+    bank = portfolio.bank_transactions
+    if not bank:
+        return {}
+    # Anchor on the newest transaction rather than today's date, so the digest
+    # stays meaningful for stale or sample data.
+    as_of = max(txn.date for txn in bank)
+    month_start = as_of[:8] + "01"
+    try:
+        window_start = (date.fromisoformat(as_of) - timedelta(days=RECENT_DAYS_WINDOW)).isoformat()
+    except ValueError:
+        window_start = month_start
+
+    month_spend = 0.0
+    month_income = 0.0
+    large = []
+    for txn in bank:
+        if txn.date >= month_start:
+            if txn.txn_type == "DEBIT":
+                month_spend += txn.amount
+            elif txn.txn_type == "CREDIT":
+                month_income += txn.amount
+        if txn.date >= window_start and txn.amount >= LARGE_TRANSACTION_MIN:
+            large.append(txn)
+
+    large.sort(key=lambda t: t.amount, reverse=True)
+    return {
+        "as_of": as_of,
+        "month_to_date_spend": round(month_spend, 2),
+        "month_to_date_income": round(month_income, 2),
+        "recent_large_transactions": [
+            {
+                "date": txn.date,
+                "amount": round(txn.amount, 2),
+                "type": txn.txn_type,
+                "bank": txn.instrument,
+                "narration": txn.narration[:NARRATION_CHARS],
+            }
+            for txn in large[:LARGE_TRANSACTIONS]
+        ],
+    }
+
+
+def build_digest(portfolio: Portfolio, credit_summary: dict | None = None) -> dict:
+    """
+    Summarises a decoded portfolio. Every list is capped, so the digest size
+    does not grow with transaction history.
+    """
+    digest: dict = {}
+    if portfolio.net_worth:
+        digest["net_worth"] = round(portfolio.net_worth.total, 2)
+        digest["total_assets"] = round(sum(a.value for a in portfolio.net_worth.assets), 2)
+        digest["total_liabilities"] = round(sum(l.value for l in portfolio.net_worth.liabilities), 2)
+        digest["asset_allocation_pct"] = _allocation(portfolio)
+    digest["top_holdings"] = _top_holdings(portfolio)
+
+    if portfolio.credit_report:
+        digest["credit_score"] = portfolio.credit_report.score
+        if credit_summary:
+            digest["credit"] = {
+                key: credit_summary[key]
+                for key in ("open_accounts", "total_outstanding", "total_overdue", "utilization_ratio")
+            }
+    if portfolio.epf:
+        digest["epf_balance"] = round(portfolio.epf.total_balance, 2)
+
+    digest.update(_bank_activity(portfolio))
+    digest["transaction_counts"] = {
+        "bank": len(portfolio.bank_transactions),
+        "mutual_fund": len(portfolio.mf_transactions),
+        "stock": len(portfolio.stock_transactions),
+    }
+    if portfolio.errors:
+        digest["errors"] = portfolio.errors
+    return digest
+
+
+def load_digest(handle: str) -> str:
+    """The digest for one fetch, serialised once and reused."""
+    def build(portfolio: Portfolio) -> str:
+        credit_summary = load_credit_index(handle).summary if portfolio.credit_report else None
+        return json.dumps(build_digest(portfolio, credit_summary), indent=2)
+
+    return portfolio_cache.load(handle).get("digest", build)
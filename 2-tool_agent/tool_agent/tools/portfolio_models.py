@@ -0,0 +1,394 @@
+# tools/portfolio_models.py
+
+"""
+Typed view over the MCP portfolio payload.
+
+The raw JSON printed by mcp_script.py is decoded once per fetch into the slotted
+dataclasses below, so the tools read plain attributes instead of walking
+nested dicts like creditReportData.creditAccount.creditAccountDetails again
+on every call.
+"""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass, field
+from datetime import date
+
+# Column order of the compact "txns" arrays returned by the MCP server.
+BANK_TXN_TYPES = {
+    1: "CREDIT", 2: "DEBIT", 3: "OPENING", 4: "INTEREST",
+    5: "TDS", 6: "INSTALLMENT", 7: "CLOSING", 8: "OTHERS",
+}
+STOCK_TXN_TYPES = {1: "BUY", 2: "SELL", 3: "BONUS", 4: "SPLIT"}
+MF_ORDER_TYPES = {1: "BUY", 2: "SELL"}
+
+# Experian account status codes that mean the account is no longer active.
+CLOSED_ACCOUNT_STATUSES = {"13", "14", "15", "16", "17"}
+
+
+def money(value) -> float:
+    """
+    Converts an MCP money object ({'units': '123', 'nanos': 500000000}) or a
+    plain number/string into a float. Missing or malformed values become 0.0.
+    """
+    if not value:
+        return 0.0
+    if isinstance(value, dict):
+        units = value.get("units") or 0
+        nanos = value.get("nanos") or 0
+        try:
+            return float(units) + float(nanos) / 1_000_000_000
+        except (TypeError, ValueError):
+            return 0.0
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def iso_date(value) -> str:
+    """
+    Normalises '2024-01-15T00:00:00Z' and '20240115' to '2024-01-15'.
+    Missing or malformed dates become '' (unknown) rather than raw text, so
+    date filters and sorting only ever compare real dates.
+    """
+    if not value:
+        return ""
+    text = str(value)
+    if len(text) >= 10 and text[4] == "-":
+        text = text[:10]
+    elif len(text) == 8 and text.isdigit():
+        text = f"{text[:4]}-{text[4:6]}-{text[6:8]}"
+    else:
+        return ""
+    try:
+        date.fromisoformat(text)
+    except ValueError:
+        return ""
+    return text
+
+
+def _code(value, names: dict) -> str:
+    try:
+        return names.get(int(value), str(value))
+    except (TypeError, ValueError):
+        return str(value or "")
+
+
+def _max_dpd(history: str) -> int:
+    """
+    Largest days-past-due figure in an Experian payment history string, which
+    is a run of 3-character buckets ('000', '030', 'STD', 'XXX', ...).
+    """
+    worst = 0
+    for i in range(0, len(history) - 2, 3):
+        chunk = history[i:i + 3]
+        if chunk.isdigit():
+            worst = max(worst, int(chunk))
+    return worst
+
+
+@dataclass(slots=True)
+class AssetValue:
+    attribute: str
+    value: float
+
+
+@dataclass(slots=True)
+class Holding:
+    name: str
+    asset_class: str
+    current_value: float
+    invested_value: float
+
+
+@dataclass(slots=True)
+class NetWorth:
+    total: float
+    assets: list[AssetValue] = field(default_factory=list)
+    liabilities: list[AssetValue] = field(default_factory=list)
+    holdings: list[Holding] = field(default_factory=list)
+
+    @classmethod
+    def from_raw(cls, raw: dict) -> NetWorth | None:
+        response = (raw or {}).get("netWorthResponse")
+        if not response:
+            return None
+        return cls(
+            total=money(response.get("totalNetWorthValue")),
+            assets=[
+                AssetValue(item.get("netWorthAttribute", ""), money(item.get("value")))
+                for item in response.get("assetValues", [])
+            ],
+            liabilities=[
+                AssetValue(item.get("netWorthAttribute", ""), money(item.get("value")))
+                for item in response.get("liabilityValues", [])
+            ],
+            holdings=[
+                _holding(scheme)
+                for scheme in raw.get("mfSchemeAnalytics", {}).get("schemeAnalytics", [])
+            ],
+        )
+
+
+def _holding(scheme: dict) -> Holding:
+    detail = scheme.get("schemeDetail", {})
+    analytics = scheme.get("enrichedAnalytics", {}).get("analytics", {}).get("schemeDetails", {})
+    return Holding(
+        name=detail.get("nameData", {}).get("longName", ""),
+        asset_class=detail.get("assetClass", ""),
+        current_value=money(analytics.get("currentValue")),
+        invested_value=money(analytics.get("investedValue")),
+    )
+
+
+@dataclass(slots=True)
+class CreditAccount:
+    lender: str
+    account_type: str
+    portfolio_type: str
+    status: str
+    is_open: bool
+    current_balance: float
+    amount_past_due: float
+    credit_limit: float
+    highest_credit: float
+    open_date: str
+    closed_date: str
+    max_dpd: int
+
+    @property
+    def utilization(self) -> float | None:
+        """Balance over credit limit (or sanctioned amount), None if unknown."""
+        limit = self.credit_limit or self.highest_credit
+        if limit <= 0:
+            return None
+        return self.current_balance / limit
+
+    @classmethod
+    def from_raw(cls, raw: dict) -> CreditAccount:
+        status = str(raw.get("accountStatus", ""))
+        closed_date = iso_date(raw.get("dateClosed"))
+        return cls(
+            lender=(raw.get("subscriberName") or "").strip(),
+            account_type=str(raw.get("accountType", "")),
+            portfolio_type=str(raw.get("portfolioType", "")),
+            status=status,
+            is_open=not closed_date and status not in CLOSED_ACCOUNT_STATUSES,
+            current_balance=money(raw.get("currentBalance")),
+            amount_past_due=money(raw.get("amountPastDue")),
+            credit_limit=money(raw.get("creditLimitAmount")),
+            highest_credit=money(raw.get("highestCreditOrOriginalLoanAmount")),
+            open_date=iso_date(raw.get("openDate")),
+            closed_date=closed_date,
+            max_dpd=_max_dpd(str(raw.get("paymentHistoryProfile", ""))),
+        )
+
+
+@dataclass(slots=True)
+class CreditReport:
+    score: int | None
+    date_of_birth: str
+    accounts: list[CreditAccount] = field(default_factory=list)
+
+    @classmethod
+    def from_raw(cls, raw: dict) -> CreditReport | None:
+        reports = (raw or {}).get("creditReports") or []
+        if not reports:
+            return None
+        data = reports[0].get("creditReportData", {})
+        score = data.get("score", {}).get("bureauScore")
+        applicant = (
+            data.get("currentApplication", {})
+            .get("currentApplicationDetails", {})
+            .get("currentApplicantDetails", {})
+        )
+        accounts = data.get("creditAccount", {}).get("creditAccountDetails", [])
+        return cls(
+            score=int(score) if str(score or "").isdigit() else None,
+            date_of_birth=iso_date(applicant.get("dateOfBirthApplicant")),
+            accounts=[CreditAccount.from_raw(account) for account in accounts],
+        )
+
+
+@dataclass(slots=True)
+class EpfAccount:
+    establishment: str
+    member_id: str
+    date_of_joining: str
+    balance: float
+    employee_share: float
+    employer_share: float
+
+
+@dataclass(slots=True)
+class EpfDetails:
+    total_balance: float
+    employee_share: float
+    employer_share: float
+    pension_balance: float
+    accounts: list[EpfAccount] = field(default_factory=list)
+
+    @classmethod
+    def from_raw(cls, raw: dict) -> EpfDetails | None:
+        uan_accounts = (raw or {}).get("uanAccounts") or []
+        if not uan_accounts:
+            return None
+        details = uan_accounts[0].get("rawDetails", {})
+        overall = details.get("overall_pf_balance", {})
+        return cls(
+            total_balance=money(overall.get("current_pf_balance")),
+            employee_share=money(overall.get("employee_share_total", {}).get("balance")),
+            employer_share=money(overall.get("employer_share_total", {}).get("balance")),
+            pension_balance=money(overall.get("pension_balance")),
+            accounts=[
+                EpfAccount(
+                    establishment=est.get("est_name", ""),
+                    member_id=est.get("member_id", ""),
+                    date_of_joining=est.get("doj_epf", ""),
+                    balance=money(est.get("pf_balance", {}).get("net_balance")),
+                    employee_share=money(est.get("pf_balance", {}).get("employee_share", {}).get("balance")),
+                    employer_share=money(est.get("pf_balance", {}).get("employer_share", {}).get("balance")),
+                )
+                for est in details.get("est_details", [])
+            ],
+        )
+
+
+@dataclass(slots=True)
+class Transaction:
+    source: str          # "bank", "mf" or "stock"
+    date: str            # ISO yyyy-mm-dd, sorts lexicographically
+    amount: float
+    txn_type: str        # CREDIT/DEBIT/BUY/SELL/...
+    instrument: str      # bank name, scheme name or ISIN
+    narration: str = ""
+    units: float = 0.0
+    balance: float = 0.0
+
+
+def _bank_transactions(raw: dict) -> list[Transaction]:
+    rows = []
+    for account in (raw or {}).get("bankTransactions", []):
+        bank = account.get("bank", "")
+        for txn in account.get("txns", []):
+            # [amount, narration, date, type, mode, balance]
+            rows.append(Transaction(
+                source="bank",
+                date=iso_date(txn[2]),
+                amount=money(txn[0]),
+                txn_type=_code(txn[3], BANK_TXN_TYPES),
+                instrument=bank,
+                narration=str(txn[1]),
+                balance=money(txn[5]) if len(txn) > 5 else 0.0,
+            ))
+    return rows
+
+
+def _mf_transactions(raw: dict) -> list[Transaction]:
+    rows = []
+    raw = raw or {}
+    # Older payloads: a flat list of transaction objects.
+    for txn in raw.get("transactions", []):
+        rows.append(Transaction(
+            source="mf",
+            date=iso_date(txn.get("transactionDate")),
+            amount=money(txn.get("transactionAmount")),
+            txn_type=str(txn.get("externalOrderType", "")),
+            instrument=txn.get("schemeName") or txn.get("isin", ""),
+            units=money(txn.get("transactionUnits")),
+        ))
+    # Current payloads: per-scheme "txns" arrays.
+    for scheme in raw.get("mfTransactions", []):
+        name = scheme.get("schemeName") or scheme.get("isin", "")
+        for txn in scheme.get("txns", []):
+            # [orderType, date, purchasePrice, purchaseUnits, transactionAmount]
+            rows.append(Transaction(
+                source="mf",
+                date=iso_date(txn[1]),
+                amount=money(txn[4]) if len(txn) > 4 else money(txn[2]) * money(txn[3]),
+                txn_type=_code(txn[0], MF_ORDER_TYPES),
+                instrument=name,
+                units=money(txn[3]),
+            ))
+    return rows
+
+
+def _stock_transactions(raw: dict) -> list[Transaction]:
+    rows = []
+    for stock in (raw or {}).get("stockTransactions", []):
+        isin = stock.get("isin", "")
+        for txn in stock.get("txns", []):
+            # [type, date, quantity, navValue]
+            quantity = money(txn[2])
+            price = money(txn[3]) if len(txn) > 3 else 0.0
+            rows.append(Transaction(
+                source="stock",
+                date=iso_date(txn[1]),
+                amount=quantity * price,
+                txn_type=_code(txn[0], STOCK_TXN_TYPES),
+                instrument=isin,
+                units=quantity,
+            ))
+    return rows
+
+
+@dataclass(slots=True)
+class Portfolio:
+    net_worth: NetWorth | None = None
+    credit_report: CreditReport | None = None
+    epf: EpfDetails | None = None
+    bank_transactions: list[Transaction] = field(default_factory=list)
+    mf_transactions: list[Transaction] = field(default_factory=list)
+    stock_transactions: list[Transaction] = field(default_factory=list)
+    errors: dict[str, str] = field(default_factory=dict)
+
+    @property
+    def transactions(self) -> list[Transaction]:
+        return self.bank_transactions + self.mf_transactions + self.stock_transactions
+
+    @classmethod
+    def from_raw(cls, all_data: dict) -> Portfolio:
+        """Builds the model from the combined dict printed by mcp_script.py."""
+        portfolio = cls()
+        if "error" in all_data:
+            portfolio.errors["portfolio"] = str(all_data["error"])
+            return portfolio
+
+        decoders = {
+            "net_worth": lambda raw: setattr(portfolio, "net_worth", NetWorth.from_raw(raw)),
+            "credit_report": lambda raw: setattr(portfolio, "credit_report", CreditReport.from_raw(raw)),
+            "epf_details": lambda raw: setattr(portfolio, "epf", EpfDetails.from_raw(raw)),
+            "bank_transactions": lambda raw: setattr(portfolio, "bank_transactions", _bank_transactions(raw)),
+            "mutual_fund_transactions": lambda raw: setattr(portfolio, "mf_transactions", _mf_transactions(raw)),
+            "stock_transactions": lambda raw: setattr(portfolio, "stock_transactions", _stock_transactions(raw)),
+        }
+        for key, decode in decoders.items():
+            raw = all_data.get(key)
+            if not isinstance(raw, dict):
+                continue
+            try:
+                decode(raw)
+            except (AttributeError, IndexError, KeyError, TypeError, ValueError) as e:
+                # One malformed dataset should not hide the others.
+                portfolio.errors[key] = f"Could not decode {key}: {e}"
+        return portfolio
+
+
+def extract_payload(script_output: str) -> dict:
+    """
+    Pulls the JSON document out of mcp_script.py's stdout, skipping the
+    '--- SCRIPT: ...' progress lines and the login prompt printed before it.
+    """
+    if script_output.startswith("{"):
+        start = 0
+    else:
+        start = script_output.find("\n{") + 1
+        if start == 0:
+            raise ValueError("No JSON payload found in portfolio script output.")
+    try:
+        return json.loads(script_output[start:])
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Portfolio script output is not valid JSON: {e}") from e
+
@@ -0,0 +1,390 @@
+# tools/portfolio_snapshot.py
+
+"""
+Binary, memory-mapped snapshots of an ingested portfolio.
+
+After each fetch the transactions are written as fixed-width columns (dates,
+amounts, dictionary-encoded types/instruments, ...) plus sort permutations,
+behind a small JSON header that also carries the digest. A worker that starts
+with only a blob handle in session state opens the file with mmap and reads the
+columns as NumPy views: nothing is parsed or copied, and every process on the
+machine shares the same page-cache pages. NumPy is imported on first use, so
+importing this module (done by the tools at agent start-up) stays cheap.
+
+File layout:
+    b"PFSNAP01" | uint32 header_len | uint64 data_start | header JSON | pad |
+    column blocks (each 64-byte aligned, offsets relative to data_start)
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+import tempfile
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from pathlib import Path
+
+from tools import blob_store
+from tools.portfolio_models import Portfolio, Transaction
+
+MAGIC = b"PFSNAP01"
+PRELUDE = struct.Struct("<IQ")
+ALIGN = 64
+VERSION = 2
+SOURCES = ["bank", "mf", "stock"]
+EPOCH = date(1970, 1, 1)
+# Stored for transactions without a (valid) date; sorts before every real date.
+NO_DATE = -2**31
+# Rows examined per vectorised step while filling a page.
+CHUNK = 512
+
+
+def snapshot_path(handle: str) -> Path:
+    """Snapshots sit next to the blob they were built from, named by its hash."""
+    # The version is part of the name, so files in an older layout are simply
+    # not found (and are pruned with their blob) instead of being misread.
+    return blob_store.BLOB_DIR / "snapshots" / f"{handle[len(blob_store.HANDLE_PREFIX):]}.v{VERSION}.snap"
+
+
+def _days(iso_date: str) -> int:
+    """Days since EPOCH, or NO_DATE for a missing or malformed date."""
+    if not iso_date:
+        return NO_DATE
+    try:
+        return (date.fromisoformat(iso_date) - EPOCH).days
+    except ValueError:
+        return NO_DATE
+
+
+def _iso(days: int) -> str:
+    days = int(days)
+    return "" if days == NO_DATE else (EPOCH + timedelta(days=days)).isoformat()
+
+
+def _align(n: int) -> int:
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def write_snapshot(path: Path, portfolio: Portfolio, digest: str, handle: str) -> None:
+    """Writes the snapshot atomically (temp file + rename)."""
+    import numpy as np
+
+    txns = sorted(portfolio.transactions, key=lambda t: t.date)
+    types = sorted({t.txn_type for t in txns})
+    instruments = sorted({t.instrument for t in txns})
+    type_code = {name: i for i, name in enumerate(types)}
+    instrument_code = {name: i for i, name in enumerate(instruments)}
+
+    narration = [t.narration.encode("utf-8") for t in txns]
+    narration_offsets = np.zeros(len(txns) + 1, dtype="<i8")
+    np.cumsum([len(n) for n in narration], out=narration_offsets[1:])
+
+    columns = {
+        "date": np.array([_days(t.date) for t in txns], dtype="<i4"),
+        "amount": np.array([t.amount for t in txns], dtype="<f8"),
+        "units": np.array([t.units for t in txns], dtype="<f8"),
+        "balance": np.array([t.balance for t in txns], dtype="<f8"),
+        "source": np.array([SOURCES.index(t.source) for t in txns], dtype="u1"),
+        "txn_type": np.array([type_code[t.txn_type] for t in txns], dtype="<i4"),
+        "instrument": np.array([instrument_code[t.instrument] for t in txns], dtype="<i4"),
+        "narration_offsets": narration_offsets,
+        "narration_bytes": np.frombuffer(b"".join(narration), dtype="u1"),
+    }
+    # Sort permutations: rows are already in date order, so a source's date
+    # order is just its row numbers.
+    columns["all_by_amount"] = np.argsort(columns["amount"], kind="stable").astype("<i4")
+    for code, source in enumerate(SOURCES):
+        rows = np.flatnonzero(columns["source"] == code).astype("<i4")
+        columns[f"{source}_by_date"] = rows
+        columns[f"{source}_by_amount"] = rows[np.argsort(columns["amount"][rows], kind="stable")]
+
+    layout = {}
+    offset = 0
+    for name, array in columns.items():
+        layout[name] = {"dtype": array.dtype.str, "offset": offset, "count": int(array.size)}
+        offset = _align(offset + array.nbytes)
+
+    header = json.dumps({
+        "version": VERSION,
+        "source_blob": handle,
+        "rows": len(txns),
+        "txn_types": types,
+        "instruments": instruments,
+        "digest": digest,
+        "columns": layout,
+    }).encode("utf-8")
+    data_start = _align(len(MAGIC) + PRELUDE.size + len(header))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC + PRELUDE.pack(len(header), data_start) + header)
+            for name, array in columns.items():
+                f.seek(data_start + layout[name]["offset"])
+                f.write(array.tobytes())
+            # Empty trailing columns still need their (zero-length) offsets in range.
+            f.truncate(data_start + offset)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class Snapshot:
+    """A memory-mapped snapshot. Column arrays are read-only views into the map."""
+
+    def __init__(self, path: Path):
+        import numpy as np
+
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path.name} is not a portfolio snapshot.")
+        header_len, data_start = PRELUDE.unpack_from(self._map, len(MAGIC))
+        start = len(MAGIC) + PRELUDE.size
+        self.header = json.loads(self._map[start:start + header_len])
+        if self.header["version"] != VERSION:
+            raise ValueError(f"Unsupported snapshot version {self.header['version']}.")
+
+        self.columns = {
+            name: np.frombuffer(self._map, dtype=spec["dtype"], count=spec["count"],
+                                offset=data_start + spec["offset"])
+            for name, spec in self.header["columns"].items()
+        }
+        self.digest: str = self.header["digest"]
+        self.txn_types: list[str] = self.header["txn_types"]
+        self.instruments: list[str] = self.header["instruments"]
+        self._stores: dict[str, SnapshotStore] | None = None
+
+    def __len__(self) -> int:
+        return self.header["rows"]
+
+    def transaction(self, row: int) -> Transaction:
+        c = self.columns
+        start, end = c["narration_offsets"][row], c["narration_offsets"][row + 1]
+        return Transaction(
+            source=SOURCES[c["source"][row]],
+            date=_iso(c["date"][row]),
+            amount=float(c["amount"][row]),
+            txn_type=self.txn_types[c["txn_type"][row]],
+            instrument=self.instruments[c["instrument"][row]],
+            narration=c["narration_bytes"][start:end].tobytes().decode("utf-8"),
+            units=float(c["units"][row]),
+            balance=float(c["balance"][row]),
+        )
+
+    def stores(self) -> dict[str, SnapshotStore]:
+        """Same keys as transaction_query.load_transaction_stores; built once."""
+        if self._stores is None:
+            stores = {"": SnapshotStore(self, None, self.columns["all_by_amount"])}
+            for source in SOURCES:
+                stores[source] = SnapshotStore(
+                    self, self.columns[f"{source}_by_date"], self.columns[f"{source}_by_amount"]
+                )
+            self._stores = stores
+        return self._stores
+
+
+class _Sorted:
+    """Sequence view of a column through a permutation, for bisect."""
+
+    def __init__(self, values, order):
+        self.values = values
+        self.order = order
+
+    def __len__(self):
+        return len(self.values) if self.order is None else len(self.order)
+
+    def __getitem__(self, i):
+        return self.values[i if self.order is None else self.order[i]]
+
+
+class SnapshotStore:
+    """
+    TransactionStore over snapshot columns: same page() contract, cursor
+    positions and range planning, but ranges are bisected on the mapped arrays
+    and rows are filtered a chunk at a time with NumPy, building Transaction
+    objects only for the rows on the returned page.
+    """
+
+    def __init__(self, snapshot: Snapshot, by_date, by_amount):
+        self.snapshot = snapshot
+        self.by_date = by_date          # None means row order (already by date)
+        self.by_amount = by_amount
+        self._date_pos_by_amount = None
+        self._amount_pos_by_date = None
+
+    def __len__(self) -> int:
+        return len(self.snapshot) if self.by_date is None else len(self.by_date)
+
+    def _cross_positions(self):
+        """Where each row sits in the other order; built on first use."""
+        import numpy as np
+
+        if self._date_pos_by_amount is None:
+            by_amount = self.by_amount.astype(np.int64)
+            # Rows in a source's date order are increasing row numbers.
+            self._date_pos_by_amount = by_amount if self.by_date is None else np.searchsorted(self.by_date, by_amount)
+            inverse = np.empty(len(by_amount), dtype=np.int64)
+            inverse[self._date_pos_by_amount] = np.arange(len(by_amount))
+            self._amount_pos_by_date = inverse
+        return self._date_pos_by_amount, self._amount_pos_by_date
+
+    def page(
+        self,
+        start_date: str = "",
+        end_date: str = "",
+        min_amount: float = 0.0,
+        max_amount: float = 0.0,
+        txn_type: str = "",
+        instrument: str = "",
+        sort: str = "date_desc",
+        limit: int = 20,
+        cursor: int | None = None,
+    ) -> tuple[list[Transaction], int | None]:
+        import numpy as np
+
+        snap = self.snapshot
+        c = snap.columns
+        dates, amounts = c["date"], c["amount"]
+        start_day = _days(start_date) if start_date else None
+        end_day = _days(end_date) if end_date else None
+        if end_day is not None and start_day is None:
+            # Undated rows (NO_DATE) sort first and never match a date filter.
+            start_day = NO_DATE + 1
+
+        date_keys = _Sorted(dates, self.by_date)
+        amount_keys = _Sorted(amounts, self.by_amount)
+        date_lo = bisect_left(date_keys, start_day) if start_day is not None else 0
+        date_hi = bisect_right(date_keys, end_day) if end_day is not None else len(date_keys)
+        amount_lo = bisect_left(amount_keys, min_amount) if min_amount else 0
+        amount_hi = bisect_right(amount_keys, max_amount) if max_amount else len(amount_keys)
+
+        by_date = sort.startswith("date")
+        if by_date:
+            order = self.by_date
+            lo, hi, other_lo, other_hi = date_lo, date_hi, amount_lo, amount_hi
+            other_filtered = bool(min_amount or max_amount)
+        else:
+            order = self.by_amount
+            lo, hi, other_lo, other_hi = amount_lo, amount_hi, date_lo, date_hi
+            other_filtered = start_day is not None or end_day is not None
+
+        type_codes = [i for i, name in enumerate(snap.txn_types) if name == txn_type.upper()] if txn_type else None
+        needle = instrument.lower()
+        instrument_codes = (
+            np.array([i for i, name in enumerate(snap.instruments) if needle in name.lower()], dtype="<i4")
+            if instrument else None
+        )
+
+        descending = sort.endswith("desc")
+        start = (hi - 1 if cursor is None else min(cursor, hi - 1)) if descending else \
+                (lo if cursor is None else max(cursor, lo))
+
+        # Same rule as transaction_query.prefer_other_range.
+        if other_filtered and limit * (hi - lo) > (other_hi - other_lo) ** 2:
+            # Visit only the other range's rows, in this sort's order.
+            date_pos_by_amount, amount_pos_by_date = self._cross_positions()
+            other_to_pos = date_pos_by_amount if by_date else amount_pos_by_date
+            candidates = np.sort(other_to_pos[other_lo:other_hi])
+            candidates = candidates[(candidates >= lo) & (candidates < hi)]
+            if descending:
+                candidates = candidates[:np.searchsorted(candidates, start, side="right")][::-1]
+            else:
+                candidates = candidates[np.searchsorted(candidates, start, side="left"):]
+            chunks = (candidates[i:i + CHUNK] for i in range(0, len(candidates), CHUNK))
+        else:
+            chunks = _position_chunks(start, lo, hi, descending)
+
+        found: list[Transaction] = []
+        for positions in chunks:
+            rows = positions if order is None else order[positions]
+
+            mask = np.ones(len(rows), dtype=bool)
+            if start_day is not None:
+                mask &= dates[rows] >= start_day
+            if end_day is not None:
+                mask &= dates[rows] <= end_day
+            if min_amount:
+                mask &= amounts[rows] >= min_amount
+            if max_amount:
+                mask &= amounts[rows] <= max_amount
+            if type_codes is not None:
+                mask &= np.isin(c["txn_type"][rows], type_codes)
+            if instrument_codes is not None:
+                mask &= np.isin(c["instrument"][rows], instrument_codes)
+
+            for hit in np.flatnonzero(mask):
+                found.append(snap.transaction(int(rows[hit])))
+                if len(found) == limit:
+                    hit_pos = int(positions[hit])
+                    next_pos = hit_pos - 1 if descending else hit_pos + 1
+                    return found, next_pos if lo <= next_pos < hi else None
+        return found, None
+
+
+def _position_chunks(start: int, lo: int, hi: int, descending: bool):
+    """Consecutive sort positions from start to the end of [lo, hi), CHUNK at a time."""
+    import numpy as np
+
+    pos = start
+    while (pos >= lo) if descending else (pos < hi):
+        if descending:
+            positions = np.arange(pos, max(pos - CHUNK, lo - 1), -1)
+        else:
+            positions = np.arange(pos, min(pos + CHUNK, hi))
+        yield positions
+        pos = int(positions[-1]) + (-1 if descending else 1)
+
+
+_open_snapshots: dict[str, Snapshot] = {}
+MAX_OPEN_SNAPSHOTS = 8
+
+
+def open_snapshot(handle: str) -> Snapshot | None:
+    """
+    Maps the snapshot for a blob handle on first use, or returns None if it has
+    not been written (or is unreadable), in which case callers fall back to the blob.
+    Misses are not cached, so a snapshot written later is still picked up.
+    """
+    if not blob_store.is_handle(handle):
+        return None
+    path = snapshot_path(handle)
+    if handle in _open_snapshots:
+        # Still mapped here, but it (and its blob) may have been pruned since.
+        if blob_store.touch(path):
+            return _open_snapshots[handle]
+        del _open_snapshots[handle]
+        return None
+    try:
+        snapshot = Snapshot(path)
+    except (OSError, ValueError, KeyError):
+        return None
+    blob_store.touch(path)
+    if len(_open_snapshots) >= MAX_OPEN_SNAPSHOTS:
+        _open_snapshots.pop(next(iter(_open_snapshots)))
+    _open_snapshots[handle] = snapshot
+    return snapshot
+
+
+def load_snapshot_stores(handle: str) -> dict[str, SnapshotStore] | None:
+    """
+    The snapshot's stores, or None if there is no snapshot (yet). Stores are
+    kept on the open Snapshot, so a miss is never remembered and they are
+    dropped with the mapping when the snapshot is evicted or pruned.
+    """
+    snapshot = open_snapshot(handle)
+    return snapshot.stores() if snapshot is not None else None
+
+
+def save_snapshot(handle: str, portfolio: Portfolio, digest: str) -> None:
+    """Writes the snapshot for a freshly stored payload, unless it already exists."""
+    path = snapshot_path(handle)
+    if not path.exists():
+        write_snapshot(path, portfolio, digest, handle)
@@ -0,0 +1,286 @@
+# tools/transaction_query.py
+
+"""
+Filtered, paginated access to the bank, mutual fund and stock transactions
+loaded by run_portfolio_flow. Only the requested page is returned to the model.
+"""
+
+import hashlib
+import json
+import re
+from bisect import bisect_left, bisect_right
+from datetime import date
+
+from google.adk.tools import FunctionTool, ToolContext
+
+from tools import portfolio_cache
+from tools.portfolio_snapshot import load_snapshot_stores
+from tools.portfolio_models import Portfolio, Transaction
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 50
+NARRATION_CHARS = 60
+SORT_ORDERS = ("date_desc", "date_asc", "amount_desc", "amount_asc")
+ISO_DATE = re.compile(r"\d{4}-\d{2}-\d{2}")
+SOURCE_ALIASES = {"bank": "bank", "mf": "mf", "mutual_fund": "mf", "mutual_funds": "mf", "stock": "stock", "stocks": "stock"}
+
+
+class TransactionStore:
+    """
+    Transactions kept sorted by date and by amount, with the sort keys in
+    parallel lists. A query bisects the sorted key for its date or amount range
+    and walks only from the cursor position until the page is full. When the
+    other key's range is the selective one (e.g. newest first, over 10000), only
+    the rows in that range are visited instead, so the cost follows the page
+    size or the narrower of the two ranges rather than the total history.
+    """
+
+    def __init__(self, transactions: list[Transaction]):
+        self.by_date = sorted(transactions, key=lambda t: t.date)
+        self.dates = [t.date for t in self.by_date]
+        # Sorted from the date order so ties match the snapshot stores' order.
+        order = sorted(range(len(self.by_date)), key=lambda i: self.by_date[i].amount)
+        self.by_amount = [self.by_date[i] for i in order]
+        self.amounts = [t.amount for t in self.by_amount]
+        # Where each row sits in the other order, for visiting one key's range
+        # in the other key's order.
+        self.date_pos_by_amount = order
+        self.amount_pos_by_date = [0] * len(order)
+        for amount_pos, date_pos in enumerate(order):
+            self.amount_pos_by_date[date_pos] = amount_pos
+
+    def __len__(self) -> int:
+        return len(self.by_date)
+
+    def _date_range(self, start_date: str, end_date: str) -> tuple[int, int]:
+        # Undated rows ("") sort first and never match a date filter.
+        if start_date:
+            lo = bisect_left(self.dates, start_date)
+        else:
+            lo = bisect_right(self.dates, "") if end_date else 0
+        hi = bisect_right(self.dates, end_date) if end_date else len(self.dates)
+        return lo, hi
+
+    def _amount_range(self, min_amount: float, max_amount: float) -> tuple[int, int]:
+        lo = bisect_left(self.amounts, min_amount) if min_amount else 0
+        hi = bisect_right(self.amounts, max_amount) if max_amount else len(self.amounts)
+        return lo, hi
+
+    def page(
+        self,
+        start_date: str = "",
+        end_date: str = "",
+        min_amount: float = 0.0,
+        max_amount: float = 0.0,
+        txn_type: str = "",
+        instrument: str = "",
+        sort: str = "date_desc",
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: int | None = None,
+    ) -> tuple[list[Transaction], int | None]:
+        """
+        Returns (rows, next_cursor). next_cursor is None on the last page.
+        Zero/empty filter values mean "no filter".
+        """
+        if sort.startswith("date"):
+            rows = self.by_date
+            lo, hi = self._date_range(start_date, end_date)
+            other_filtered = bool(min_amount or max_amount)
+            other_lo, other_hi = self._amount_range(min_amount, max_amount)
+            other_to_pos = self.date_pos_by_amount
+        else:
+            rows = self.by_amount
+            lo, hi = self._amount_range(min_amount, max_amount)
+            other_filtered = bool(start_date or end_date)
+            other_lo, other_hi = self._date_range(start_date, end_date)
+            other_to_pos = self.amount_pos_by_date
+
+        txn_type = txn_type.upper()
+        instrument = instrument.lower()
+
+        def matches(txn: Transaction) -> bool:
+            # Residual filters not covered by the bisected range.
+            return (
+                (not start_date or txn.date >= start_date)
+                and (not end_date or "" < txn.date <= end_date)
+                and (not min_amount or txn.amount >= min_amount)
+                and (not max_amount or txn.amount <= max_amount)
+                and (not txn_type or txn.txn_type == txn_type)
+                and (not instrument or instrument in txn.instrument.lower())
+            )
+
+        descending = sort.endswith("desc")
+        start = (hi - 1 if cursor is None else min(cursor, hi - 1)) if descending else \
+                (lo if cursor is None else max(cursor, lo))
+
+        if other_filtered and prefer_other_range(limit, hi - lo, other_hi - other_lo):
+            # Visit only the other range's rows, in this sort's order.
+            candidates = sorted(p for p in other_to_pos[other_lo:other_hi] if lo <= p < hi)
+            if descending:
+                positions = reversed(candidates[:bisect_right(candidates, start)])
+            else:
+                positions = candidates[bisect_left(candidates, start):]
+        elif descending:
+            positions = range(start, lo - 1, -1)
+        else:
+            positions = range(start, hi)
+
+        found: list[Transaction] = []
+        for pos in positions:
+            txn = rows[pos]
+            if matches(txn):
+                found.append(txn)
+                if len(found) == limit:
+                    next_pos = pos - 1 if descending else pos + 1
+                    return found, next_pos if lo <= next_pos < hi else None
+        return found, None
+
+
+def prefer_other_range(limit: int, span: int, other_span: int) -> bool:
+    """
+    Whether to visit the other key's range instead of walking the sort key's.
+    Walking finds a page in about limit * span / other_span rows if matches
+    are spread evenly; visiting the other range costs other_span rows.
+    """
+    return limit * span > other_span * other_span
+
+
+def _transaction_row(txn: Transaction) -> dict:
+    row = {
+        "date": txn.date,
+        "source": txn.source,
+        "type": txn.txn_type,
+        "amount": round(txn.amount, 2),
+        "instrument": txn.instrument,
+    }
+    if txn.narration:
+        row["narration"] = txn.narration[:NARRATION_CHARS]
+    if txn.units:
+        row["units"] = txn.units
+    if txn.source == "bank" and txn.balance:
+        row["balance"] = round(txn.balance, 2)
+    return row
+
+
+def _build_stores(portfolio: Portfolio) -> dict[str, TransactionStore]:
+    return {
+        "": TransactionStore(portfolio.transactions),
+        "bank": TransactionStore(portfolio.bank_transactions),
+        "mf": TransactionStore(portfolio.mf_transactions),
+        "stock": TransactionStore(portfolio.stock_transactions),
+    }
+
+
+def _is_iso_date(value: str) -> bool:
+    if not ISO_DATE.fullmatch(value):
+        return False
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+def _query_key(handle: str, source_key: str, start_date: str, end_date: str, min_amount: float,
+               max_amount: float, txn_type: str, instrument: str, sort: str) -> str:
+    """
+    Short fingerprint of everything a cursor position depends on, so a cursor
+    is only accepted by the query (and fetch) that issued it.
+    """
+    query = [handle, source_key, start_date, end_date, float(min_amount or 0), float(max_amount or 0),
+             txn_type.upper(), instrument.lower(), sort]
+    return hashlib.blake2s(json.dumps(query).encode("utf-8"), digest_size=6).hexdigest()
+
+
+def load_transaction_stores(handle: str) -> dict[str, TransactionStore]:
+    """One store per source plus "" for all of them, built once per fetch."""
+    return portfolio_cache.load(handle).get("transaction_stores", _build_stores)
+
+
+def query_transactions(
+    source: str,
+    start_date: str,
+    end_date: str,
+    min_amount: float,
+    max_amount: float,
+    txn_type: str,
+    instrument: str,
+    sort: str,
+    limit: int,
+    cursor: str,
+    tool_context: ToolContext,
+) -> dict:
+    """
+    Looks up the user's transactions with filters, sorting and pagination.
+    Use this instead of get_portfolio_details for any question about
+    individual transactions (e.g. 'last 20 bank transactions over 10000').
+
+    Args:
+        source: 'bank', 'mutual_fund' or 'stock'. Use '' for all sources.
+        start_date: Earliest date, 'YYYY-MM-DD'. Use '' for no limit.
+        end_date: Latest date (inclusive), 'YYYY-MM-DD'. Use '' for no limit.
+        min_amount: Smallest amount in INR. Use 0 for no limit.
+        max_amount: Largest amount in INR. Use 0 for no limit.
+        txn_type: e.g. 'DEBIT', 'CREDIT', 'BUY', 'SELL'. Use '' for any type.
+        instrument: Part of the bank name, fund name or ISIN. Use '' for any.
+        sort: 'date_desc' (newest first), 'date_asc', 'amount_desc' or 'amount_asc'.
+        limit: Page size, at most 50. Use 0 for the default of 20.
+        cursor: '' for the first page, otherwise the 'next_cursor' value
+            returned by the previous call with the same source, filters and sort.
+
+    Returns:
+        A dict with the matching 'transactions' for this page, their 'count',
+        and 'next_cursor' ('' when there are no more pages).
+    """
+    handle = portfolio_cache.state_handle(tool_context)
+    if handle is None:
+        return {"status": "error", "message": "No portfolio loaded yet. Call run_portfolio_flow first."}
+    # Prefer the memory-mapped snapshot; decode the stored payload only if
+    # there is none (e.g. sessions from before snapshots were written).
+    stores = load_snapshot_stores(handle)
+    if stores is None:
+        try:
+            stores = load_transaction_stores(handle)
+        except ValueError as e:
+            return {"status": "error", "message": f"{e} Call run_portfolio_flow again."}
+
+    source_key = SOURCE_ALIASES.get(source.strip().lower(), "") if source else ""
+    if source and not source_key:
+        return {"status": "error", "message": f"Unknown source '{source}'. Use 'bank', 'mutual_fund', 'stock' or ''."}
+    for name, value in (("start_date", start_date), ("end_date", end_date)):
+        if value and not _is_iso_date(value):
+            return {"status": "error", "message": f"Invalid {name} '{value}'. Use 'YYYY-MM-DD' or ''."}
+    sort = sort or "date_desc"
+    if sort not in SORT_ORDERS:
+        return {"status": "error", "message": f"Unknown sort '{sort}'. Use one of: {', '.join(SORT_ORDERS)}."}
+
+    query_key = _query_key(handle, source_key, start_date, end_date, min_amount, max_amount, txn_type, instrument, sort)
+    position = None
+    if cursor:
+        cursor_key, _, cursor_pos = cursor.partition(":")
+        if cursor_key != query_key or not cursor_pos.isdigit():
+            return {"status": "error", "message": "This cursor belongs to a different query (source, filters or sort changed). Start again with cursor ''."}
+        position = int(cursor_pos)
+
+    page_size = min(limit, MAX_PAGE_SIZE) if limit and limit > 0 else DEFAULT_PAGE_SIZE
+    store = stores[source_key]
+    rows, next_position = store.page(
+        start_date=start_date,
+        end_date=end_date,
+        min_amount=min_amount,
+        max_amount=max_amount,
+        txn_type=txn_type,
+        instrument=instrument,
+        sort=sort,
+        limit=page_size,
+        cursor=position,
+    )
+    return {
+        "status": "success",
+        "count": len(rows),
+        "transactions": [_transaction_row(txn) for txn in rows],
+        "next_cursor": f"{query_key}:{next_position}" if next_position is not None else "",
+    }
+
+
+transaction_query_tool = FunctionTool(func=query_transactions)
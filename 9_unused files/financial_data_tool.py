@@ -5,6 +5,7 @@ import json
 import webbrowser
 import sys
 import traceback
+from pathlib import Path
 
 # Import MCP client libraries (assuming they are installed in your virtual environment)
 # Make sure these are accessible by your ADK project.
@@ -12,34 +13,62 @@ from mcp.client.streamable_http import streamablehttp_client
 from mcp.client.session import ClientSession
 from mcp.types import CallToolResult, TextContent
 
+# Shared fair-share limiter for upstream MCP calls, from the tool agent's tools
+# package (see mcp_service.py).
+TOOL_AGENT_DIR = Path(__file__).resolve().parent.parent / "2-tool_agent" / "tool_agent"
+if str(TOOL_AGENT_DIR) not in sys.path:
+    sys.path.insert(0, str(TOOL_AGENT_DIR))
+from tools.mcp_scheduler import INTERACTIVE, scheduler
+
+# Data types this tool can fetch, in the order batch results are reported.
+DATA_TYPES = [
+    "net_worth", "credit_report", "epf_details",
+    "mf_transactions", "bank_transactions", "stock_transactions",
+]
+
+# **IMPORTANT**: Update this URL to match your actual MCP server's stream endpoint.
+MCP_STREAM_URL = "http://localhost:8080/mcp/stream"
+
 class FinancialDataFetcherTool(BaseTool):
     """
-    A tool to fetch various financial data (Net Worth, Credit Report, EPF, Mutual Funds)
-    from a local MCP server, handling login interactions.
+    A tool to fetch various financial data (Net Worth, Credit Report, EPF, Mutual Funds,
+    Bank and Stock Transactions) from a local MCP server, handling login interactions.
+    Several data types can be fetched in one call over a single MCP session.
     """
 
     # 1. Define the tool's name – this is how the LLM will refer to it.
     name = "fetch_financial_data"
 
+    # User and priority its MCP calls are queued under. This tool is not given
+    # the ADK invocation context, so it queues as the local user, like mcp_script.
+    user_id = "local"
+    priority = INTERACTIVE
+
     # 2. Provide a clear description so the LLM knows when to use this tool.
     description = (
-        "Fetches various financial data types (e.g., 'net_worth', 'credit_report', 'epf_details', 'mf_transactions') "
-        "from a connected local MCP server. If a login is required, it will return a login URL "
-        "for the user to complete the login externally."
+        "Fetches various financial data types (e.g., 'net_worth', 'credit_report', 'epf_details', 'mf_transactions', "
+        "'bank_transactions', 'stock_transactions') from a connected local MCP server. Pass 'data_types' with a list "
+        "to fetch several at once, e.g. for questions that need both net worth and credit report. If a login is "
+        "required, it will return a login URL for the user to complete the login externally."
     )
 
     # 3. Define the input schema (arguments) your tool expects.
-    # The 'data_type' argument tells the tool what specific financial data to fetch.
+    # 'data_type' fetches one dataset; 'data_types' fetches several in one batch.
     input_schema = {
         "type": "object",
         "properties": {
             "data_type": {
                 "type": "string",
-                "enum": ["net_worth", "credit_report", "epf_details", "mf_transactions"],
+                "enum": DATA_TYPES,
                 "description": "The type of financial data to fetch (e.g., 'net_worth', 'credit_report')."
+            },
+            "data_types": {
+                "type": "array",
+                "items": {"type": "string", "enum": DATA_TYPES},
+                "description": "Several data types to fetch together over one connection (e.g., ['net_worth', 'bank_transactions'])."
             }
         },
-        "required": ["data_type"]
+        "anyOf": [{"required": ["data_type"]}, {"required": ["data_types"]}]
     }
 
     # --- Internal Helper: Adapted from your call_mcp_tool function ---
@@ -49,7 +78,7 @@ class FinancialDataFetcherTool(BaseTool):
         max_retries = 1 # We'll let the main tool logic handle retries after external login if needed.
 
         try:
-            response: CallToolResult = await session.call_tool(bare_tool_name, args)
+            response: CallToolResult = await scheduler.call(session, bare_tool_name, args, self.user_id, self.priority)
             parsed_json_content = None
 
             if response.content and isinstance(response.content, list) and len(response.content) > 0:
@@ -64,17 +93,11 @@ class FinancialDataFetcherTool(BaseTool):
             else:
                 return response # Return raw CallToolResult if no content
 
-            # Handle login_required status: Return the status instead of blocking with input()
+            # Handle login_required status: Return the status instead of blocking with input().
+            # The caller opens the login page, so a batch opens it only once.
             if parsed_json_content and parsed_json_content.get("status") == "login_required":
                 login_url = parsed_json_content.get("login_url")
                 message = parsed_json_content.get("message")
-                if login_url:
-                    # Attempt to open browser on the server machine, but do not block the agent.
-                    try:
-                        webbrowser.open_new_tab(login_url)
-                    except Exception:
-                        pass # Ignore if browser cannot be opened automatically
-
                 # Return a structured dictionary indicating login is required
                 return {"status": "login_required", "login_url": login_url, "message": message}
 
@@ -98,71 +121,113 @@ class FinancialDataFetcherTool(BaseTool):
     async def _fetch_mf_transactions_data_internal(self, session: ClientSession) -> dict | str:
         return await self._call_mcp_tool_internal(session, 'networth:fetch_mf_transactions', {})
 
+    async def _fetch_bank_transactions_data_internal(self, session: ClientSession) -> dict | str:
+        return await self._call_mcp_tool_internal(session, 'networth:fetch_bank_transactions', {})
+
+    async def _fetch_stock_transactions_data_internal(self, session: ClientSession) -> dict | str:
+        return await self._call_mcp_tool_internal(session, 'networth:fetch_stock_transactions', {})
+
+    def _fetcher(self, data_type: str):
+        """Returns the internal fetch function for a data type, or None if unsupported."""
+        return {
+            "net_worth": self._fetch_net_worth_data_internal,
+            "credit_report": self._fetch_credit_report_data_internal,
+            "epf_details": self._fetch_epf_details_data_internal,
+            "mf_transactions": self._fetch_mf_transactions_data_internal,
+            "bank_transactions": self._fetch_bank_transactions_data_internal,
+            "stock_transactions": self._fetch_stock_transactions_data_internal,
+        }.get(data_type)
+
+    # --- Summaries: short human-readable text for each data type ---
+    def _summarize(self, data_type: str, raw_response) -> str:
+        summary_text = f"Successfully fetched {data_type.replace('_', ' ')} data."
+        if not isinstance(raw_response, dict):
+            return summary_text
+        if data_type == "net_worth" and 'netWorthResponse' in raw_response:
+            total_value_units = raw_response['netWorthResponse']['totalNetWorthValue']['units']
+            total_value_nanos = raw_response['netWorthResponse']['totalNetWorthValue'].get('nanos', 0)
+            total_value = float(total_value_units) + (total_value_nanos / 1_000_000_000)
+            summary_text = f"Total Net Worth: {total_value:.2f} INR."
+        elif data_type == "credit_report" and 'creditReports' in raw_response and len(raw_response['creditReports']) > 0:
+            score = raw_response['creditReports'][0]['creditReportData']['score']['bureauScore']
+            summary_text = f"Credit Score: {score}."
+        elif data_type == "epf_details" and 'uanAccounts' in raw_response and len(raw_response['uanAccounts']) > 0:
+            total_balance = float(raw_response['uanAccounts'][0]['rawDetails'].get('overall_pf_balance', {}).get('current_pf_balance', 0))
+            summary_text = f"EPF Total Balance: {total_balance:.2f} INR."
+        elif data_type == "mf_transactions" and ('transactions' in raw_response or 'mfTransactions' in raw_response):
+            # Older payloads list transactions flat; current ones group "txns" per scheme.
+            schemes = raw_response.get('mfTransactions', [])
+            count = len(raw_response.get('transactions', [])) + sum(len(scheme.get('txns', [])) for scheme in schemes)
+            summary_text = f"Fetched {count} mutual fund transactions."
+            if schemes:
+                summary_text = f"Fetched {count} mutual fund transactions across {len(schemes)} schemes."
+        elif data_type == "bank_transactions" and 'bankTransactions' in raw_response:
+            count = sum(len(account.get('txns', [])) for account in raw_response['bankTransactions'])
+            summary_text = f"Fetched {count} bank transactions across {len(raw_response['bankTransactions'])} accounts."
+        elif data_type == "stock_transactions" and 'stockTransactions' in raw_response:
+            count = sum(len(stock.get('txns', [])) for stock in raw_response['stockTransactions'])
+            summary_text = f"Fetched {count} stock transactions across {len(raw_response['stockTransactions'])} stocks."
+        return summary_text
+
+    def _open_login_page(self, login_url: str | None) -> None:
+        if login_url:
+            # Attempt to open browser on the server machine, but do not block the agent.
+            try:
+                webbrowser.open_new_tab(login_url)
+            except Exception:
+                pass # Ignore if browser cannot be opened automatically
+
+    def _login_required_output(self, raw_response: dict, what: str) -> ToolOutput:
+        self._open_login_page(raw_response.get("login_url"))
+        login_url = raw_response.get("login_url", "No URL provided.")
+        # Return an error ToolOutput to the agent, prompting user action
+        return ToolOutput(
+            raw_output=json.dumps(raw_response, indent=2),
+            display_text=(
+                f"Access to {what} requires login. "
+                f"Please visit this URL to complete login in your browser: {login_url}. "
+                f"After logging in successfully, you can ask me to try fetching the data again."
+            ),
+            is_error=True
+        )
+
     # --- Main execution method for the ADK tool ---
-    async def _run(self, data_type: str) -> ToolOutput:
-        # **IMPORTANT**: Update this URL to match your actual MCP server's stream endpoint.
-        mcp_stream_url = "http://localhost:8080/mcp/stream"
+    async def _run(self, data_type: str | None = None, data_types: list[str] | None = None) -> ToolOutput:
+        if data_types:
+            return await self._run_batch(data_types)
+        if not data_type:
+            return ToolOutput(
+                raw_output="Either data_type or data_types must be provided.",
+                display_text="No financial data type provided.",
+                is_error=True
+            )
 
         try:
+            # Pick the internal fetch function for the requested data_type
+            fetch = self._fetcher(data_type)
+            if fetch is None:
+                # Handle invalid data_type requests from the LLM
+                return ToolOutput(
+                    raw_output=f"Invalid data_type requested: {data_type}. Supported types are: {', '.join(DATA_TYPES)}.",
+                    display_text="Invalid financial data type provided.",
+                    is_error=True
+                )
+
             # Connect to the MCP streamable HTTP client and create a ClientSession
-            async with streamablehttp_client(mcp_stream_url) as (read_stream, write_stream, _):
+            async with streamablehttp_client(MCP_STREAM_URL) as (read_stream, write_stream, _):
                 async with ClientSession(read_stream, write_stream) as session:
                     await session.initialize()
-
-                    # Call the appropriate internal fetch function based on the requested data_type
-                    if data_type == "net_worth":
-                        raw_response = await self._fetch_net_worth_data_internal(session)
-                    elif data_type == "credit_report":
-                        raw_response = await self._fetch_credit_report_data_internal(session)
-                    elif data_type == "epf_details":
-                        raw_response = await self._fetch_epf_details_data_internal(session)
-                    elif data_type == "mf_transactions":
-                        raw_response = await self._fetch_mf_transactions_data_internal(session)
-                    else:
-                        # Handle invalid data_type requests from the LLM
-                        return ToolOutput(
-                            raw_output=f"Invalid data_type requested: {data_type}. Supported types are: net_worth, credit_report, epf_details, mf_transactions.",
-                            display_text="Invalid financial data type provided.",
-                            is_error=True
-                        )
+                    raw_response = await fetch(session)
 
                     # Check if the internal call returned a login_required status
                     if isinstance(raw_response, dict) and raw_response.get("status") == "login_required":
-                        login_url = raw_response.get("login_url", "No URL provided.")
-                        message = raw_response.get("message", "Login required to proceed.")
-                        # Return an error ToolOutput to the agent, prompting user action
-                        return ToolOutput(
-                            raw_output=json.dumps(raw_response, indent=2),
-                            display_text=(
-                                f"Access to {data_type.replace('_', ' ')} requires login. "
-                                f"Please visit this URL to complete login in your browser: {login_url}. "
-                                f"After logging in successfully, you can ask me to try fetching the data again."
-                            ),
-                            is_error=True
-                        )
+                        return self._login_required_output(raw_response, data_type.replace('_', ' '))
 
                     # If no login is required, process and return the fetched data
                     if raw_response:
-                        summary_text = f"Successfully fetched {data_type.replace('_', ' ')} data."
-                        # You can add more detailed summary parsing here if needed,
-                        # similar to how your original script parsed and printed specific fields.
-                        if data_type == "net_worth" and isinstance(raw_response, dict) and 'netWorthResponse' in raw_response:
-                            total_value_units = raw_response['netWorthResponse']['totalNetWorthValue']['units']
-                            total_value_nanos = raw_response['netWorthResponse']['totalNetWorthValue'].get('nanos', 0)
-                            total_value = float(total_value_units) + (total_value_nanos / 1_000_000_000)
-                            summary_text = f"Total Net Worth: {total_value:.2f} INR."
-                        elif data_type == "credit_report" and isinstance(raw_response, dict) and 'creditReports' in raw_response and len(raw_response['creditReports']) > 0:
-                            score = raw_response['creditReports'][0]['creditReportData']['score']['bureauScore']
-                            summary_text = f"Credit Score: {score}."
-                        elif data_type == "epf_details" and isinstance(raw_response, dict) and 'uanAccounts' in raw_response and len(raw_response['uanAccounts']) > 0:
-                            total_balance = float(raw_response['uanAccounts'][0]['rawDetails'].get('overall_pf_balance', {}).get('current_pf_balance', 0))
-                            summary_text = f"EPF Total Balance: {total_balance:.2f} INR."
-                        elif data_type == "mf_transactions" and isinstance(raw_response, dict) and 'transactions' in raw_response:
-                            summary_text = f"Fetched {len(raw_response['transactions'])} mutual fund transactions."
-
                         return ToolOutput(
                             raw_output=json.dumps(raw_response, indent=2),
-                            display_text=summary_text
+                            display_text=self._summarize(data_type, raw_response)
                         )
                     else:
                         # Case where response is empty but not an error or login_required
@@ -178,4 +243,69 @@ class FinancialDataFetcherTool(BaseTool):
                 raw_output=f"An unexpected error occurred while fetching {data_type}: {e}\n{traceback.format_exc()}",
                 display_text=f"An error occurred while trying to fetch {data_type.replace('_', ' ')}. Please check the MCP server and network connection. Error: {e}",
                 is_error=True
-            )
\ No newline at end of file
+            )
+
+    async def _run_batch(self, data_types: list[str]) -> ToolOutput:
+        """
+        Fetches several data types concurrently over one MCP session and returns
+        per-dataset results and summaries in a single ToolOutput.
+        """
+        # Keep the caller's order but drop duplicates.
+        requested = list(dict.fromkeys(data_types))
+        invalid = [data_type for data_type in requested if self._fetcher(data_type) is None]
+        if invalid:
+            return ToolOutput(
+                raw_output=f"Invalid data_types requested: {', '.join(invalid)}. Supported types are: {', '.join(DATA_TYPES)}.",
+                display_text="Invalid financial data type provided.",
+                is_error=True
+            )
+
+        try:
+            async with streamablehttp_client(MCP_STREAM_URL) as (read_stream, write_stream, _):
+                async with ClientSession(read_stream, write_stream) as session:
+                    await session.initialize()
+                    # One round of latency for all datasets instead of one connection each.
+                    responses = await asyncio.gather(
+                        *(self._fetcher(data_type)(session) for data_type in requested),
+                        return_exceptions=True
+                    )
+        except Exception as e:
+            return ToolOutput(
+                raw_output=f"An unexpected error occurred while fetching {', '.join(requested)}: {e}\n{traceback.format_exc()}",
+                display_text=f"An error occurred while trying to fetch financial data. Please check the MCP server and network connection. Error: {e}",
+                is_error=True
+            )
+
+        # All datasets share the session, so one login prompt covers them all.
+        for raw_response in responses:
+            if isinstance(raw_response, dict) and raw_response.get("status") == "login_required":
+                return self._login_required_output(raw_response, "your financial data")
+
+        # Each dataset is summarised and checked for serialisability on its own,
+        # so one malformed or non-JSON response is reported as that dataset's error.
+        results = {}
+        summaries = []
+        for data_type, raw_response in zip(requested, responses):
+            label = data_type.replace('_', ' ')
+            if isinstance(raw_response, Exception):
+                results[data_type] = {"status": "error", "error": str(raw_response)}
+                summaries.append(f"Could not fetch {label}: {raw_response}")
+            elif not raw_response:
+                results[data_type] = {"status": "empty", "error": "No data available or accounts not connected."}
+                summaries.append(f"No {label} data available or accounts might not be connected to MCP.")
+            else:
+                try:
+                    summary_text = self._summarize(data_type, raw_response)
+                    json.dumps(raw_response)
+                except Exception as e:
+                    results[data_type] = {"status": "error", "error": f"Could not read the {label} response: {e}"}
+                    summaries.append(f"Could not read {label} data: {e}")
+                else:
+                    results[data_type] = {"status": "success", "summary": summary_text, "data": raw_response}
+                    summaries.append(summary_text)
+
+        return ToolOutput(
+            raw_output=json.dumps(results, indent=2),
+            display_text="\n".join(summaries),
+            is_error=all(result["status"] != "success" for result in results.values())
+        )
@@ -1,14 +1,187 @@
 import asyncio
+import contextlib
 import json
 import webbrowser
 import os
-from fastapi import FastAPI
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from fastapi import FastAPI, HTTPException, Request, Response
 from mcp.client.session import ClientSession
 from mcp.client.streamable_http import streamablehttp_client
 from mcp.types import CallToolResult, TextContent
 
+# Shared fair-share limiter for upstream MCP calls. It lives in the tool agent's
+# tools package, so put that folder on the path whatever directory this service
+# is started from.
+TOOL_AGENT_DIR = Path(__file__).resolve().parent.parent / "2-tool_agent" / "tool_agent"
+if str(TOOL_AGENT_DIR) not in sys.path:
+    sys.path.insert(0, str(TOOL_AGENT_DIR))
+from tools.mcp_scheduler import BACKGROUND, INTERACTIVE, scheduler
+
 app = FastAPI()
 
+# --- CPU work offloading ---
+# JSON decoding, analytics and re-encoding of large payloads run in a worker
+# pool instead of on the event loop, so one user's big transaction history does
+# not stall the other requests. Workers take the tool results' raw text and hand
+# back the encoded response body, so only strings and bytes cross the process
+# boundary (never a decoded dict). "process" uses every core; "thread" skips
+# even that copy and suits smaller payloads.
+WORKER_MODE = os.environ.get("MCP_WORKER_MODE", "process")
+WORKERS = int(os.environ.get("MCP_WORKERS", os.cpu_count() or 2))
+# Requests admitted at once (each holds a slot from before its upstream MCP
+# calls until its worker job is done); beyond that callers wait up to
+# MCP_QUEUE_TIMEOUT seconds for a slot and then get a 503, before any upstream work.
+MAX_PENDING = int(os.environ.get("MCP_MAX_PENDING", WORKERS * 4))
+QUEUE_TIMEOUT = float(os.environ.get("MCP_QUEUE_TIMEOUT", 10))
+
+
+# Worker functions live at module level so the process pool can pickle them.
+def decode_tool_text(text: str):
+    """Decodes a tool result's text, falling back to the raw text if it is not JSON."""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return {"raw": text}
+
+
+def summarize_portfolio(data: dict) -> dict:
+    """Small per-dataset analytics over the decoded data (counts and totals)."""
+    summary = {}
+    net_worth = (data.get("net_worth") or {}).get("netWorthResponse", {})
+    total = net_worth.get("totalNetWorthValue")
+    if total:
+        summary["net_worth"] = float(total.get("units", 0)) + float(total.get("nanos", 0)) / 1_000_000_000
+    reports = (data.get("credit_report") or {}).get("creditReports") or []
+    if reports:
+        report = reports[0].get("creditReportData", {})
+        summary["credit_score"] = report.get("score", {}).get("bureauScore")
+        summary["credit_accounts"] = len(report.get("creditAccount", {}).get("creditAccountDetails", []))
+    mf = data.get("mutual_fund_transactions") or {}
+    summary["mutual_fund_transactions"] = len(mf.get("transactions", [])) + sum(
+        len(scheme.get("txns", [])) for scheme in mf.get("mfTransactions", [])
+    )
+    return summary
+
+
+def build_data_response(texts: dict, include_summary: bool) -> bytes:
+    """
+    Decodes each tool result's text (None for an empty result), adds the
+    summary if asked, and returns the encoded JSON body, all in the worker.
+    """
+    data = {name: decode_tool_text(text) if text is not None else None for name, text in texts.items()}
+    if include_summary:
+        data["summary"] = summarize_portfolio(data)
+    return json.dumps(data).encode("utf-8")
+
+
+class WorkerPool:
+    """
+    Executor with bounded admission and queue metrics. Requests past
+    MAX_PENDING wait for a free slot (backpressure) instead of piling up.
+    """
+
+    def __init__(self, mode: str, workers: int, max_pending: int):
+        self.mode = mode
+        self.workers = workers
+        self.max_pending = max_pending
+        executor_class = ProcessPoolExecutor if mode == "process" else ThreadPoolExecutor
+        self.executor = executor_class(max_workers=workers)
+        self.slots = asyncio.Semaphore(max_pending)
+        self.waiting = 0
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait_s = 0.0
+        self.max_wait_s = 0.0
+        self.total_run_s = 0.0
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        """Holds one admission slot; raises a 503 if none frees up within QUEUE_TIMEOUT."""
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.slots.acquire(), timeout=QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Server busy, please retry shortly.")
+        finally:
+            self.waiting -= 1
+
+        waited = time.perf_counter() - queued_at
+        self.total_wait_s += waited
+        self.max_wait_s = max(self.max_wait_s, waited)
+        try:
+            yield
+        finally:
+            self.slots.release()
+
+    async def execute(self, func, *args):
+        """Runs func in the pool; the caller already holds a slot."""
+        started_at = time.perf_counter()
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+            self.total_run_s += time.perf_counter() - started_at
+
+    async def run(self, func, *args):
+        async with self.slot():
+            return await self.execute(func, *args)
+
+    def metrics(self) -> dict:
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "queue_depth": self.waiting,
+            "in_flight": self.pending,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait_s / self.completed * 1000, 2) if self.completed else 0.0,
+            "max_wait_ms": round(self.max_wait_s * 1000, 2),
+            "avg_run_ms": round(self.total_run_s / self.completed * 1000, 2) if self.completed else 0.0,
+        }
+
+
+worker_pool = WorkerPool(WORKER_MODE, WORKERS, MAX_PENDING)
+loop_lag = {"last_ms": 0.0, "max_ms": 0.0}
+
+
+async def _monitor_loop_lag(interval: float = 0.5):
+    """Records how late the event loop wakes up, i.e. how long it was blocked."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lag_ms = (time.perf_counter() - start - interval) * 1000
+        loop_lag["last_ms"] = round(lag_ms, 2)
+        loop_lag["max_ms"] = round(max(loop_lag["max_ms"], lag_ms), 2)
+
+
+@app.on_event("startup")
+async def start_loop_lag_monitor():
+    asyncio.create_task(_monitor_loop_lag())
+
+
+@app.on_event("shutdown")
+async def stop_worker_pool():
+    worker_pool.executor.shutdown(wait=False, cancel_futures=True)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Worker pool and MCP scheduler queue depth and wait times, plus event loop lag."""
+    return {
+        "worker_pool": worker_pool.metrics(),
+        "mcp_scheduler": scheduler.metrics(),
+        "event_loop_lag": loop_lag,
+    }
+
 # This helper function creates a new, clean session for every request.
 async def get_mcp_session(session_id: str = None):
     url = "http://localhost:8080/mcp/stream"
@@ -22,13 +195,18 @@ async def get_mcp_session(session_id: str = None):
     return session, client
 
 @app.post("/start-login")
-async def start_login():
-    """This route creates a new session and triggers the login flow."""
+async def start_login(request: Request):
+    """
+    This route creates a new session and triggers the login flow. There is no
+    session ID yet, so the call is queued under the caller's address: logins
+    from different clients are separate users to the scheduler.
+    """
+    user_id = f"login:{request.client.host if request.client else 'unknown'}"
     session, client = await get_mcp_session()
     try:
-        response: CallToolResult = await session.call_tool('fetch_net_worth', {})
+        response: CallToolResult = await scheduler.call(session, 'fetch_net_worth', {}, user_id, INTERACTIVE)
         if response.content and isinstance(response.content, list) and len(response.content) > 0:
-            parsed_content = json.loads(response.content[0].text)
+            parsed_content = await worker_pool.run(decode_tool_text, response.content[0].text)
             if parsed_content.get("status") == "login_required":
                 login_url = parsed_content.get("login_url")
                 if login_url:
@@ -44,29 +222,43 @@ async def start_login():
         await client.__aexit__(None, None, None)
 
 @app.get("/get-data")
-async def get_data():
-    """This route reads the session ID and reconnects to fetch data."""
+async def get_data(include_summary: bool = False, background: bool = False):
+    """
+    This route reads the session ID and reconnects to fetch data. MCP calls are
+    queued per user (the session ID) through the scheduler; background=true
+    marks a refresh that yields to interactive requests. Decoding, the optional
+    summary and encoding the response run as one worker pool job, off the
+    event loop, and the encoded body is returned as is.
+    """
     try:
         with open("mcp_session.tmp", "r") as f:
             session_id = f.read().strip()
     except FileNotFoundError:
         return {"error": "Session file not found. Please log in first."}, 404
 
-    session, client = await get_mcp_session(session_id=session_id)
-    try:
-        async def call_tool(name):
-            response: CallToolResult = await session.call_tool(name, {})
-            return json.loads(response.content[0].text) if response.content else None
-        
-        data = {
-            "net_worth": await call_tool('fetch_net_worth'),
-            "credit_report": await call_tool('fetch_credit_report'),
-            "epf_details": await call_tool('fetch_epf_details'),
-            "mutual_fund_transactions": await call_tool('fetch_mf_transactions'),
-        }
-        return data
-    finally:
-        # Always ensure the client connection is closed and the temp file is removed
-        await client.__aexit__(None, None, None)
-        if os.path.exists("mcp_session.tmp"):
-            os.remove("mcp_session.tmp")
+    priority = BACKGROUND if background else INTERACTIVE
+    # Admission comes first, so an overloaded service turns requests away
+    # before doing their upstream work, and a rejected request (503) keeps the
+    # session file for its retry.
+    async with worker_pool.slot():
+        session, client = await get_mcp_session(session_id=session_id)
+        try:
+            async def call_tool(name):
+                response: CallToolResult = await scheduler.call(session, name, {}, session_id, priority)
+                if not response.content:
+                    return None
+                return response.content[0].text
+
+            texts = {
+                "net_worth": await call_tool('fetch_net_worth'),
+                "credit_report": await call_tool('fetch_credit_report'),
+                "epf_details": await call_tool('fetch_epf_details'),
+                "mutual_fund_transactions": await call_tool('fetch_mf_transactions'),
+            }
+            body = await worker_pool.execute(build_data_response, texts, include_summary)
+            return Response(content=body, media_type="application/json")
+        finally:
+            # Always ensure the client connection is closed and the temp file is removed
+            await client.__aexit__(None, None, None)
+            if os.path.exists("mcp_session.tmp"):
+                os.remove("mcp_session.tmp")
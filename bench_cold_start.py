@@ -0,0 +1,116 @@
+"""
+Cold-start benchmark for the three agent packages.
+
+For each package it starts fresh interpreters and measures:
+  - load:        `import <package>` plus resolving `<package>.agent.root_agent`,
+                 which `adk web` does in one step when it loads the app
+  - first reply: one turn through an ADK Runner, from the user message to the
+                 final response. The model is a stub that answers at once, so
+                 this is the agent's own first-request cost: building the tool
+                 declarations (process_llm_request), the tool_agent's deferred
+                 tools and google_search sub-agent (tools/lazy_tool.LazyTool),
+                 and the runner and flow machinery
+It also times importing mcp_script (the MCP client), which the portfolio tool
+now pays once per process instead of once per fetch in a subprocess.
+
+Run from the repository root:  python bench_cold_start.py [runs]
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+
+# (label, folder adk web is started from, package ADK imports)
+PACKAGES = [
+    ("greet_agent", ROOT / "1-Basic_agent", "greet_agent"),
+    ("tool_agent", ROOT / "2-tool_agent" / "tool_agent", "agents"),
+    ("google_agent", ROOT / "3-google_search_Agent", "google_agent"),
+]
+
+AGENT_PROBE = """
+import asyncio, json, sys, time
+sys.path.insert(0, ".")
+start = time.perf_counter()
+result = {{}}
+try:
+    import {package} as package
+    root_agent = package.agent.root_agent
+    loaded = time.perf_counter()
+    result["load"] = loaded - start
+
+    from google.adk.models import BaseLlm, LlmResponse
+    from google.adk.runners import InMemoryRunner
+    from google.genai import types
+
+    class StubLlm(BaseLlm):
+        # Answers without a network call and records what it was sent.
+        async def generate_content_async(self, llm_request, stream=False):
+            # Function declarations, plus built-in tools such as google_search.
+            tools = llm_request.config.tools or []
+            result["declared_tools"] = sum(len(tool.function_declarations or []) or 1 for tool in tools)
+            yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text="Hello!")]))
+
+    # Keep the real model name: built-in tools such as google_search check it.
+    root_agent.model = StubLlm(model=root_agent.canonical_model.model)
+
+    async def first_reply():
+        runner = InMemoryRunner(root_agent, app_name="{package}")
+        session = runner.session_service.create_session(app_name="{package}", user_id="bench")
+        message = types.Content(role="user", parts=[types.Part(text="Hi")])
+        async for event in runner.run_async(user_id="bench", session_id=session.id, new_message=message):
+            if event.is_final_response():
+                return
+
+    asyncio.run(first_reply())
+    result["first_reply"] = time.perf_counter() - loaded
+except Exception as e:
+    result["error"] = f"{{type(e).__name__}}: {{e}}"
+print(json.dumps(result))
+"""
+
+MCP_PROBE = """
+import json, sys, time
+sys.path.insert(0, ".")
+start = time.perf_counter()
+import mcp_script
+print(json.dumps({"import": time.perf_counter() - start}))
+"""
+
+
+def _run(code: str, cwd: Path) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", code], cwd=cwd, capture_output=True, text=True, timeout=120
+    )
+    if result.returncode != 0:
+        last_line = (result.stderr.strip().splitlines() or ["unknown error"])[-1]
+        return {"error": last_line}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _median_ms(samples: list[dict], key: str) -> str:
+    values = [s[key] for s in samples if key in s]
+    return f"{statistics.median(values) * 1e3:9.1f} ms" if values else "      n/a"
+
+
+def main(runs: int) -> None:
+    print(f"{'package':<14}{'load':>12}{'first reply':>14}{'tools':>7}   ({runs} fresh interpreters each)")
+    for label, cwd, package in PACKAGES:
+        samples = [_run(AGENT_PROBE.format(package=package), cwd) for _ in range(runs)]
+        errors = {s["error"] for s in samples if "error" in s}
+        declared = next((s["declared_tools"] for s in samples if "declared_tools" in s), "n/a")
+        print(f"{label:<14}{_median_ms(samples, 'load'):>12}{_median_ms(samples, 'first_reply'):>14}{declared:>7}")
+        for error in errors:
+            print(f"  ! {error}")
+
+    samples = [_run(MCP_PROBE, ROOT / "2-tool_agent" / "tool_agent") for _ in range(runs)]
+    print(f"{'mcp client':<14}{_median_ms(samples, 'import'):>12}")
+    for error in {s["error"] for s in samples if "error" in s}:
+        print(f"  ! {error}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5)